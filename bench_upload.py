@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Benchmark : upload via requests vs upload_transport, temps CPU et débit, HTTP et HTTPS.
+
+Le serveur local tourne dans un processus séparé : le temps CPU mesuré
+(time.process_time) est celui du client seul. Tous les hébergeurs réels sont en
+HTTPS : c'est le chemin "tampon TLS" d'upload_transport qui tourne en production,
+sendfile ne s'applique qu'en HTTP clair. Le serveur HTTPS utilise un certificat
+auto-signé (openssl), déclaré au client via REQUESTS_CA_BUNDLE.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import ssl
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+import upload_transport
+
+
+class _SinkHandler(BaseHTTPRequestHandler):
+    """Lit et jette le corps de la requête, répond avec le nombre d'octets reçus."""
+
+    def _sink(self):
+        remaining = int(self.headers["Content-Length"])
+        received = 0
+        while remaining:
+            chunk = self.rfile.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                break
+            received += len(chunk)
+            remaining -= len(chunk)
+        body = json.dumps({"received": received}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_PUT = _sink
+    do_POST = _sink
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve(port_queue, cert=None):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SinkHandler)
+    if cert:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*cert)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def _self_signed_cert(directory):
+    """Génère un certificat auto-signé pour 127.0.0.1. Retourne (certificat, clé)."""
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-keyout", key, "-out", cert, "-subj", "/CN=127.0.0.1",
+         "-addext", "subjectAltName=IP:127.0.0.1"],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def _start_server(cert=None):
+    """Démarre le serveur dans un processus séparé. Retourne (processus, URL)."""
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=_serve, args=(port_queue, cert), daemon=True)
+    server.start()
+    scheme = "https" if cert else "http"
+    return server, f"{scheme}://127.0.0.1:{port_queue.get()}/upload"
+
+
+def _put_requests(url, path):
+    with open(path, "rb") as f:
+        resp = requests.put(url, data=f, timeout=600)
+    resp.raise_for_status()
+
+
+def _put_transport(url, path):
+    upload_transport.put_file(url, path, timeout=600).raise_for_status()
+
+
+def _post_requests(url, path):
+    with open(path, "rb") as f:
+        resp = requests.post(url, files={"file": (os.path.basename(path), f)}, timeout=600)
+    resp.raise_for_status()
+
+
+def _post_transport(url, path):
+    upload_transport.post_multipart(url, "file", path, timeout=600).raise_for_status()
+
+
+def _measure(upload, url, path, parallel, rounds):
+    """Retourne (secondes CPU client, Mo/s) moyennés sur rounds."""
+    size_mb = os.path.getsize(path) * parallel / (1024 * 1024)
+    cpu_total = wall_total = 0.0
+    for _ in range(rounds):
+        cpu, wall = time.process_time(), time.perf_counter()
+        with ThreadPoolExecutor(max_workers=parallel) as pool:
+            list(pool.map(lambda _: upload(url, path), range(parallel)))
+        cpu_total += time.process_time() - cpu
+        wall_total += time.perf_counter() - wall
+    return cpu_total / rounds, size_mb * rounds / wall_total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=200, help="Taille du fichier (défaut : 200)")
+    parser.add_argument("--parallel", type=int, default=3, help="Uploads simultanés (défaut : 3)")
+    parser.add_argument("--rounds", type=int, default=3, help="Répétitions (défaut : 3)")
+    parser.add_argument(
+        "--scheme", choices=["http", "https", "both"], default="both",
+        help="Serveur local en HTTP clair, HTTPS (chemin de production) ou les deux",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cert = _self_signed_cert(workdir) if args.scheme != "http" else None
+        if cert:
+            # Fait confiance au certificat auto-signé (transport et requests lisent la même variable).
+            os.environ["REQUESTS_CA_BUNDLE"] = cert[0]
+
+        path = os.path.join(workdir, "sample.mp4")
+        block = os.urandom(1024 * 1024)
+        with open(path, "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(block)
+
+        print(f"{args.parallel} x {args.size_mb} Mo, {args.rounds} tours")
+        schemes = ["http", "https"] if args.scheme == "both" else [args.scheme]
+        for scheme in schemes:
+            server, url = _start_server(cert if scheme == "https" else None)
+            print(f"\n{scheme.upper()} (upload_transport : chemin {upload_transport.upload_path(url)})")
+            print(f"{'méthode':<26}{'CPU client (s)':>16}{'débit (Mo/s)':>16}")
+            for label, upload in [
+                ("PUT requests", _put_requests),
+                ("PUT upload_transport", _put_transport),
+                ("POST multipart requests", _post_requests),
+                ("POST upload_transport", _post_transport),
+            ]:
+                cpu, rate = _measure(upload, url, path, args.parallel, args.rounds)
+                print(f"{label:<26}{cpu:>16.2f}{rate:>16.0f}")
+            server.terminate()
+
+
+if __name__ == "__main__":
+    main()
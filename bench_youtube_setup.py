@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Benchmark : coût de préparation YouTube par vidéo (credentials + client), avant/après cache.
+
+Utilise un token factice non expiré : aucune requête réseau n'est envoyée.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+
+import publipostage
+
+
+def _setup_uncached():
+    """Ancien chemin : token relu et discovery reconstruit à chaque vidéo."""
+    creds = Credentials.from_authorized_user_file(
+        publipostage.YT_TOKEN_PATH, publipostage.YOUTUBE_SCOPES,
+    )
+    return build("youtube", "v3", credentials=creds)
+
+
+def _setup_cached():
+    """Nouveau chemin : credentials et client mis en cache dans le processus."""
+    return publipostage.yt_get_service(publipostage.yt_get_credentials())
+
+
+def _timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20, help="Vidéos simulées (défaut : 20)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        publipostage.YT_TOKEN_PATH = os.path.join(tmp, "youtube_token.json")
+        publipostage.YT_DISCOVERY_PATH = os.path.join(tmp, "youtube_discovery.json")
+        with open(publipostage.YT_TOKEN_PATH, "w") as f:
+            json.dump({
+                "token": "bench", "refresh_token": "bench",
+                "client_id": "bench", "client_secret": "bench",
+                "expiry": (datetime.utcnow() + timedelta(hours=1)).isoformat() + "Z",  # noqa: DTZ003
+            }, f)
+
+        before = _timed(_setup_uncached, args.runs)
+        # Premier appel : document écrit sur disque ; on vide le cache mémoire pour
+        # mesurer aussi un démarrage de processus avec le document déjà stocké.
+        first = _timed(_setup_cached, 1)[0]
+        publipostage._yt_cache.clear()
+        cold = _timed(_setup_cached, 1)[0]
+        after = _timed(_setup_cached, args.runs)
+
+    print(f"{'chemin':<36}{'ms/vidéo':>12}")
+    print(f"{'avant (build à chaque vidéo)':<36}{statistics.median(before):>12.2f}")
+    print(f"{'après, 1er appel (doc à écrire)':<36}{first:>12.2f}")
+    print(f"{'après, 1er appel (doc local)':<36}{cold:>12.2f}")
+    print(f"{'après, appels suivants':<36}{statistics.median(after):>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Budget de temps global : une échéance par lot et par média, propagée à chaque phase.
+
+Chaque appel réseau prend comme timeout le minimum entre sa borne habituelle et le
+temps restant ; une attente (poll, backoff) qui ne peut plus aboutir avant l'échéance
+est annulée tout de suite par DeadlineExceeded au lieu de consommer le budget.
+"""
+
+import math
+import time
+
+# En dessous, une phase n'a aucune chance d'aboutir : inutile de la démarrer.
+MIN_PHASE_SECONDS = 1
+
+
+class DeadlineExceeded(RuntimeError):
+    """Le budget de temps est épuisé : la phase en cours est annulée."""
+
+
+class Deadline:
+    """Échéance absolue (horloge monotone), éventuellement bornée par une échéance parente."""
+
+    def __init__(self, seconds=None, parent=None):
+        self.expires = math.inf if seconds is None else time.monotonic() + seconds
+        if parent is not None:
+            self.expires = min(self.expires, parent.expires)
+
+    def remaining(self):
+        """Secondes restantes (math.inf sans échéance)."""
+        return self.expires - time.monotonic()
+
+    def check(self, phase):
+        """Lève DeadlineExceeded si le temps restant ne permet plus de démarrer phase."""
+        if self.remaining() < MIN_PHASE_SECONDS:
+            raise DeadlineExceeded(f"délai dépassé avant : {phase}")
+
+    def timeout(self, cap, phase):
+        """Timeout d'un appel : cap, réduit au temps restant."""
+        self.check(phase)
+        return min(cap, self.remaining())
+
+    def sleep(self, seconds, phase):
+        """Attend seconds, sauf si l'échéance tombe avant : annulation immédiate."""
+        if self.remaining() < seconds + MIN_PHASE_SECONDS:
+            raise DeadlineExceeded(f"délai insuffisant pour attendre {seconds}s ({phase})")
+        time.sleep(seconds)
+
+    def child(self, seconds=None):
+        """Sous-échéance : seconds au plus, jamais au-delà de celle-ci."""
+        return Deadline(seconds, parent=self)
+
+    def share(self, parts):
+        """Part équitable du temps restant entre parts phases.
+
+        Recalculée à chaque phase : le temps non consommé par une phase terminée
+        tôt revient aux suivantes.
+        """
+        if math.isinf(self.remaining()):
+            return self.child()
+        return self.child(self.remaining() / max(1, parts))
+
+
+NO_DEADLINE = Deadline()
@@ -2,15 +2,26 @@
 """Publipostage - Publie des vidéos sur Instagram et TikTok depuis la ligne de commande."""
 
 import argparse
+import hashlib
+import json
 import os
 import random
 import shutil
 import sys
+import threading
 import time
 import tomllib
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 
+import quota
+import transcode
+import upload_transport
+import watch
+import work_queue
+from deadline import NO_DEADLINE, Deadline, DeadlineExceeded
 from instagram_auth import get_instagram_token
 
 INSTAGRAM_API = "https://graph.instagram.com/v25.0"
@@ -20,9 +31,23 @@ TMPFILES_URL = "https://tmpfiles.org/api/v1/upload"
 TEMP_HOST_RETENTION = "72h"
 # Taille maximale (Mo) : borne minimale commune aux hébergeurs supportés.
 TEMP_MAX_SIZE_MB = 200
+# Vérification des URLs temporaires : échantillons (début, milieu, fin) comparés au fichier local.
+VERIFY_SAMPLE_SIZE = 64 * 1024
 CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.toml")
 YT_TOKEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "youtube_token.json")
 YOUTUBE_SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
+YT_DISCOVERY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "youtube_discovery.json")
+YT_DISCOVERY_URL = "https://www.googleapis.com/discovery/v1/apis/youtube/v3/rest"
+# Upload YouTube par morceaux : l'échéance globale est vérifiée entre deux morceaux.
+YT_CHUNK_SIZE = 16 * 1024 * 1024
+# Timeout (s) des opérations réseau d'un morceau, réduit au temps restant avant l'échéance.
+YT_CHUNK_TIMEOUT = 60
+# Attente maximale (s) acceptée pour qu'un quota se libère avant de reporter une plateforme.
+QUOTA_MAX_WAIT = 120
+# Part maximale du temps restant (échéance) consacrée à cette attente : le reste doit
+# suffire aux uploads, sinon la plateforme est reportée.
+QUOTA_MAX_WAIT_SHARE = 0.25
+PLATFORM_CODES = {"Instagram": "ig", "TikTok": "tt", "YouTube": "yt"}
 
 
 def load_config():
@@ -67,15 +92,14 @@ def timestamp_to_ms(ts):
     return int(seconds * 1000)
 
 
-def _upload_litterbox(file_path):
+def _upload_litterbox(file_path, deadline=NO_DEADLINE):
     """Upload sur litterbox (catbox). Retourne l'URL brute du corps de la réponse."""
-    with open(file_path, "rb") as f:
-        resp = requests.post(
-            LITTERBOX_URL,
-            data={"reqtype": "fileupload", "time": TEMP_HOST_RETENTION},
-            files={"fileToUpload": (os.path.basename(file_path), f)},
-            timeout=600,
-        )
+    resp = upload_transport.post_multipart(
+        LITTERBOX_URL, "fileToUpload", file_path,
+        fields={"reqtype": "fileupload", "time": TEMP_HOST_RETENTION},
+        timeout=deadline.timeout(600, "upload litterbox"),
+        expires=deadline.expires,
+    )
     resp.raise_for_status()
     # litterbox retourne directement l'URL brute dans le corps de la réponse.
     url = resp.text.strip()
@@ -87,14 +111,13 @@ def _upload_litterbox(file_path):
     return url
 
 
-def _upload_tmpfiles(file_path):
+def _upload_tmpfiles(file_path, deadline=NO_DEADLINE):
     """Upload sur tmpfiles.org. Retourne l'URL directe (via insertion de /dl/)."""
-    with open(file_path, "rb") as f:
-        resp = requests.post(
-            TMPFILES_URL,
-            files={"file": (os.path.basename(file_path), f)},
-            timeout=600,
-        )
+    resp = upload_transport.post_multipart(
+        TMPFILES_URL, "file", file_path,
+        timeout=deadline.timeout(600, "upload tmpfiles"),
+        expires=deadline.expires,
+    )
     resp.raise_for_status()
     # tmpfiles.org retourne une URL de page ; on insère /dl/ pour le lien direct.
     url = resp.json()["data"]["url"]
@@ -108,28 +131,129 @@ TEMP_HOSTS = [
 ]
 
 
-def upload_temp(file_path):
+def _local_sample_digest(file_path, offset, length):
+    """Empreinte SHA-256 d'une plage d'octets du fichier local."""
+    with open(file_path, "rb") as f:
+        f.seek(offset)
+        return hashlib.sha256(f.read(length)).hexdigest()
+
+
+def _verify_range(url, file_path, offset, length, size, deadline=NO_DEADLINE):
+    """Compare une plage distante (GET ranged) au fichier local.
+
+    Retourne True si la réponse (Content-Range) confirme aussi la taille totale, False
+    sinon ; une plage hors début que l'hébergeur sert en entier (Range ignoré) n'est
+    pas vérifiable sans tout télécharger et n'est pas comparée. Lève RuntimeError en
+    cas d'écart.
+    """
+    with requests.get(
+        url,
+        headers={"Range": f"bytes={offset}-{offset + length - 1}"},
+        stream=True,
+        timeout=deadline.timeout(30, "vérification de l'URL temporaire"),
+    ) as resp:
+        if resp.status_code == 200 and offset > 0:
+            return False
+        if resp.status_code not in (200, 206):
+            raise RuntimeError(f"HTTP {resp.status_code} sur la plage {offset}+{length}")
+        total = resp.headers.get("Content-Range", "").rpartition("/")[2]
+        size_confirmed = resp.status_code == 206 and total.isdigit()
+        if size_confirmed and int(total) != size:
+            raise RuntimeError(f"taille distante {total} octets, {size} attendus")
+        remote = b""
+        for chunk in resp.iter_content(chunk_size=length):
+            remote += chunk
+            if len(remote) >= length:
+                break
+    if hashlib.sha256(remote[:length]).hexdigest() != _local_sample_digest(file_path, offset, length):
+        raise RuntimeError(f"contenu distant différent du fichier local (octet {offset})")
+    return size_confirmed
+
+
+def _verify_length(url, size, deadline=NO_DEADLINE):
+    """Vérifie la taille servie par un GET complet : Content-Length, sinon octets comptés.
+
+    Dernier recours quand ni HEAD ni Range n'ont pu confirmer la taille : un fichier
+    tronqué ne doit pas passer sur la seule foi du premier échantillon.
+    """
+    with requests.get(
+        url, stream=True, timeout=deadline.timeout(30, "vérification de l'URL temporaire"),
+    ) as resp:
+        if not resp.ok:
+            raise RuntimeError(f"URL inaccessible (HTTP {resp.status_code})")
+        length = resp.headers.get("Content-Length")
+        if length is None or "Content-Encoding" in resp.headers:
+            length = 0
+            for chunk in resp.iter_content(chunk_size=1024 * 1024):
+                deadline.check("vérification de l'URL temporaire")
+                length += len(chunk)
+    if int(length) != size:
+        raise RuntimeError(f"taille distante {length} octets, {size} attendus")
+
+
+def verify_temp_url(url, file_path, deadline=NO_DEADLINE):
+    """Vérifie qu'une URL temporaire sert bien le fichier local, octet pour octet.
+
+    HEAD : statut, type (une page HTML trahit un lien non direct) et Content-Length ;
+    puis GET ranged sur quelques échantillons, vérifiés en parallèle. Si ni HEAD ni
+    Range n'ont confirmé la taille, elle est vérifiée par un GET complet. Lève
+    RuntimeError si l'URL ne convient pas, avant que Meta ne passe des minutes à la
+    traiter.
+    """
+    size = os.path.getsize(file_path)
+    resp = requests.head(
+        url, allow_redirects=True,
+        timeout=deadline.timeout(30, "vérification de l'URL temporaire"),
+    )
+    size_confirmed = False
+    # Certains hébergeurs refusent HEAD : on se rabat sur les GET.
+    if resp.status_code not in (405, 501):
+        if not resp.ok:
+            raise RuntimeError(f"URL inaccessible (HTTP {resp.status_code})")
+        if resp.headers.get("Content-Type", "").startswith("text/html"):
+            raise RuntimeError("l'URL renvoie une page HTML, pas un lien direct")
+        length = resp.headers.get("Content-Length")
+        if length is not None and int(length) != size:
+            raise RuntimeError(f"taille distante {length} octets, {size} attendus")
+        size_confirmed = length is not None
+
+    if not size:
+        return
+    sample = min(VERIFY_SAMPLE_SIZE, size)
+    offsets = sorted({0, max(0, size // 2 - sample // 2), size - sample})
+    with ThreadPoolExecutor(max_workers=len(offsets)) as pool:
+        confirmed = list(pool.map(
+            lambda off: _verify_range(url, file_path, off, sample, size, deadline), offsets,
+        ))
+    if not (size_confirmed or any(confirmed)):
+        _verify_length(url, size, deadline)
+
+
+def upload_temp(file_path, deadline=NO_DEADLINE):
     """Upload un fichier sur un hébergement temporaire, retourne l'URL publique.
 
     Essaie chaque hébergeur de TEMP_HOSTS à tour de rôle : si le premier échoue
-    (panne, timeout, réponse invalide), on bascule sur le suivant.
+    (panne, timeout, réponse invalide, ou URL qui ne sert pas le bon fichier selon
+    verify_temp_url), on bascule sur le suivant.
     """
     file_size = os.path.getsize(file_path) / (1024 * 1024)
     if file_size > TEMP_MAX_SIZE_MB:
-        print(
-            f"Erreur : fichier trop volumineux ({file_size:.0f} Mo, "
-            f"max {TEMP_MAX_SIZE_MB} Mo)",
-            file=sys.stderr,
+        raise RuntimeError(
+            f"fichier trop volumineux ({file_size:.0f} Mo, max {TEMP_MAX_SIZE_MB} Mo), "
+            "relance avec --transcode"
         )
-        sys.exit(1)
 
     errors = []
     for name, uploader in TEMP_HOSTS:
         try:
-            return uploader(file_path)
+            url = uploader(file_path, deadline=deadline)
+            verify_temp_url(url, file_path, deadline=deadline)
+            return url
+        except DeadlineExceeded:
+            raise
         except Exception as exc:  # noqa: BLE001 - on veut basculer quel que soit l'échec
             errors.append(f"{name} : {exc}")
-            print(f"  Hébergeur {name} indisponible ({exc})", file=sys.stderr)
+            print(f"  Hébergeur {name} en échec ({exc})", file=sys.stderr)
 
     raise RuntimeError(
         "Tous les hébergeurs temporaires ont échoué :\n  - " + "\n  - ".join(errors)
@@ -140,20 +264,24 @@ def upload_temp(file_path):
 
 IG_MAX_RETRIES = 3
 IG_RETRY_BACKOFF = [5, 15, 30]  # seconds between attempts
+IG_CAROUSEL_MAX_ITEMS = 10
 
 
-def _ig_request(method, url, *, retry=True, **kwargs):
+def _ig_request(method, url, *, retry=True, deadline=NO_DEADLINE, **kwargs):
     """Effectue une requête vers l'API Instagram avec retry sur les erreurs serveur.
 
     Les 5xx (et erreurs réseau) sont réessayés avec backoff : un 500 corps vide de
     graph.instagram.com est généralement un incident transitoire côté Meta.
     Les 4xx (token, requête invalide) ne sont PAS réessayés — ils ne se résoudront pas seuls.
+    Un backoff qui dépasserait l'échéance lève DeadlineExceeded au lieu d'attendre.
     """
-    kwargs.setdefault("timeout", 30)
+    timeout = kwargs.pop("timeout", 30)
     for attempt in range(IG_MAX_RETRIES):
         last = attempt == IG_MAX_RETRIES - 1
         try:
-            resp = requests.request(method, url, **kwargs)
+            resp = requests.request(
+                method, url, timeout=deadline.timeout(timeout, "requête Instagram"), **kwargs,
+            )
         except requests.RequestException as exc:
             if not retry or last:
                 raise
@@ -173,80 +301,181 @@ def _ig_request(method, url, *, retry=True, **kwargs):
             f"dans {delay}s ({attempt + 2}/{IG_MAX_RETRIES})...",
             file=sys.stderr,
         )
-        time.sleep(delay)
+        deadline.sleep(delay, "nouvelle tentative Instagram")
 
     # Ne devrait jamais être atteint : la dernière itération lève toujours.
     raise RuntimeError("Instagram : échec après plusieurs tentatives")
 
 
-def ig_create_container(account_id, token, video_url, caption, thumb_offset=None, cover_url=None):
-    """Crée un container média Instagram."""
-    data = {
-        "media_type": "REELS",
-        "video_url": video_url,
-        "caption": caption,
-        "access_token": token,
-    }
+def ig_create_container(account_id, token, video_url, caption, thumb_offset=None, cover_url=None,
+                        is_carousel_item=False, deadline=NO_DEADLINE):
+    """Crée un container média Instagram (Reel, ou vidéo enfant d'un carrousel)."""
+    if is_carousel_item:
+        # Les enfants d'un carrousel n'ont pas de caption : elle est portée par le parent.
+        data = {
+            "media_type": "VIDEO",
+            "video_url": video_url,
+            "is_carousel_item": "true",
+            "access_token": token,
+        }
+    else:
+        data = {
+            "media_type": "REELS",
+            "video_url": video_url,
+            "caption": caption,
+            "access_token": token,
+        }
     if thumb_offset is not None:
         data["thumb_offset"] = thumb_offset
     if cover_url:
         data["cover_url"] = cover_url
 
-    resp = _ig_request("POST", f"{INSTAGRAM_API}/{account_id}/media", data=data)
+    resp = _ig_request("POST", f"{INSTAGRAM_API}/{account_id}/media", data=data, deadline=deadline)
     return resp.json()["id"]
 
 
-def ig_wait_for_ready(container_id, token, timeout=300, interval=5):
-    """Attend que le container Instagram soit prêt."""
-    elapsed = 0
-    while elapsed < timeout:
-        resp = _ig_request(
-            "GET",
-            f"{INSTAGRAM_API}/{container_id}",
-            params={"fields": "status_code,status", "access_token": token},
-        )
-        data = resp.json()
-        status = data.get("status_code")
+def ig_create_carousel_container(account_id, token, children_ids, caption, deadline=NO_DEADLINE):
+    """Crée le container parent d'un carrousel à partir des containers enfants."""
+    resp = _ig_request(
+        "POST",
+        f"{INSTAGRAM_API}/{account_id}/media",
+        data={
+            "media_type": "CAROUSEL",
+            "children": ",".join(children_ids),
+            "caption": caption,
+            "access_token": token,
+        },
+        deadline=deadline,
+    )
+    return resp.json()["id"]
 
-        if status == "FINISHED":
-            return True
-        if status == "ERROR":
-            print(f"  Erreur Instagram : {data.get('status')}", file=sys.stderr)
-            return False
 
-        print(f"  Instagram : {status}...")
-        time.sleep(interval)
-        elapsed += interval
+def _ig_container_status(container_id, token, deadline=NO_DEADLINE):
+    """Retourne (status_code, status) d'un container Instagram."""
+    resp = _ig_request(
+        "GET",
+        f"{INSTAGRAM_API}/{container_id}",
+        params={"fields": "status_code,status", "access_token": token},
+        deadline=deadline,
+    )
+    data = resp.json()
+    return data.get("status_code"), data.get("status")
+
+
+def ig_wait_for_ready_many(container_ids, token, timeout=300, interval=5, deadline=NO_DEADLINE):
+    """Attend que tous les containers Instagram soient prêts, interrogés dans une même boucle.
+
+    À chaque tour, les containers encore en traitement sont interrogés en parallèle :
+    la durée totale est celle du plus lent, pas la somme. Retourne False dès qu'un
+    container passe en ERROR.
+    """
+    pending = list(container_ids)
+    elapsed = 0
+    with ThreadPoolExecutor(max_workers=max(1, len(pending))) as pool:
+        while elapsed < timeout:
+            statuses = dict(zip(pending, pool.map(lambda cid: _ig_container_status(cid, token, deadline), pending)))
+            for status, detail in statuses.values():
+                if status == "ERROR":
+                    print(f"  Erreur Instagram : {detail}", file=sys.stderr)
+                    return False
+            pending = [cid for cid, (status, _) in statuses.items() if status != "FINISHED"]
+            if not pending:
+                return True
+
+            if len(statuses) == 1:
+                print(f"  Instagram : {statuses[pending[0]][0]}...")
+            else:
+                done = len(container_ids) - len(pending)
+                print(f"  Instagram : {done}/{len(container_ids)} prêts...")
+            deadline.sleep(interval, "traitement Instagram")
+            elapsed += interval
 
     print("  Instagram : timeout", file=sys.stderr)
     return False
 
 
-def ig_publish(account_id, container_id, token):
+def ig_wait_for_ready(container_id, token, timeout=300, interval=5, deadline=NO_DEADLINE):
+    """Attend que le container Instagram soit prêt."""
+    return ig_wait_for_ready_many(
+        [container_id], token, timeout=timeout, interval=interval, deadline=deadline,
+    )
+
+
+def ig_publish(account_id, container_id, token, deadline=NO_DEADLINE):
     """Publie le média sur Instagram."""
     resp = _ig_request(
         "POST",
         f"{INSTAGRAM_API}/{account_id}/media_publish",
         data={"creation_id": container_id, "access_token": token},
+        deadline=deadline,
     )
     return resp.json()
 
 
-def publish_instagram(account_id, token, video_url, caption, thumb_offset=None, cover_url=None):
+def ig_publishing_limit(account_id, token, deadline=NO_DEADLINE):
+    """Retourne (publications sur 24 h, limite) selon content_publishing_limit."""
+    resp = _ig_request(
+        "GET",
+        f"{INSTAGRAM_API}/{account_id}/content_publishing_limit",
+        params={"fields": "config,quota_usage", "access_token": token},
+        deadline=deadline,
+    )
+    data = resp.json()["data"][0]
+    return data.get("quota_usage", 0), data.get("config", {}).get("quota_total")
+
+
+def publish_instagram(account_id, token, video_url, caption, thumb_offset=None, cover_url=None,
+                      deadline=NO_DEADLINE):
     """Flux complet de publication Instagram."""
     print("\n[Instagram]")
     print("  Création du container...")
     container_id = ig_create_container(
         account_id, token, video_url, caption,
-        thumb_offset=thumb_offset, cover_url=cover_url,
+        thumb_offset=thumb_offset, cover_url=cover_url, deadline=deadline,
     )
 
     print("  Traitement...")
-    if not ig_wait_for_ready(container_id, token):
+    if not ig_wait_for_ready(container_id, token, deadline=deadline):
         return False
 
     print("  Publication...")
-    result = ig_publish(account_id, container_id, token)
+    result = ig_publish(account_id, container_id, token, deadline=deadline)
+    print(f"  OK ! ID : {result.get('id')}")
+    return True
+
+
+def publish_instagram_carousel(account_id, token, video_paths, caption, deadline=NO_DEADLINE):
+    """Flux complet de publication d'un carrousel Instagram (plusieurs clips).
+
+    Les uploads temporaires et la création des containers enfants sont menés en
+    parallèle, puis tous les enfants sont attendus ensemble avant de publier le parent.
+    """
+    print("\n[Instagram]")
+    print(f"  Upload et création de {len(video_paths)} containers enfants...")
+
+    def create_child(path):
+        video_url = upload_temp(path, deadline=deadline)
+        print(f"  OK : {os.path.basename(path)} -> {video_url}")
+        return ig_create_container(
+            account_id, token, video_url, None, is_carousel_item=True, deadline=deadline,
+        )
+
+    with ThreadPoolExecutor(max_workers=len(video_paths)) as pool:
+        children_ids = list(pool.map(create_child, video_paths))
+
+    print("  Traitement des clips...")
+    if not ig_wait_for_ready_many(children_ids, token, deadline=deadline):
+        return False
+
+    print("  Création du carrousel...")
+    container_id = ig_create_carousel_container(
+        account_id, token, children_ids, caption, deadline=deadline,
+    )
+    if not ig_wait_for_ready(container_id, token, deadline=deadline):
+        return False
+
+    print("  Publication...")
+    result = ig_publish(account_id, container_id, token, deadline=deadline)
     print(f"  OK ! ID : {result.get('id')}")
     return True
 
@@ -254,7 +483,7 @@ def publish_instagram(account_id, token, video_url, caption, thumb_offset=None,
 # --- TikTok ---
 
 
-def tt_init_upload(token, caption, video_size, thumb_offset=None):
+def tt_init_upload(token, caption, video_size, thumb_offset=None, deadline=NO_DEADLINE):
     """Initialise l'upload vidéo sur TikTok."""
     post_info = {
         "title": caption,
@@ -280,7 +509,7 @@ def tt_init_upload(token, caption, video_size, thumb_offset=None):
             "Content-Type": "application/json",
         },
         json=data,
-        timeout=30,
+        timeout=deadline.timeout(30, "init TikTok"),
     )
     if not resp.ok:
         print(f"  Erreur API TikTok : {resp.status_code} {resp.text}", file=sys.stderr)
@@ -292,22 +521,22 @@ def tt_init_upload(token, caption, video_size, thumb_offset=None):
     return result["data"]["publish_id"], result["data"]["upload_url"]
 
 
-def tt_upload_video(upload_url, video_path, video_size):
+def tt_upload_video(upload_url, video_path, video_size, deadline=NO_DEADLINE):
     """Upload la vidéo sur TikTok."""
-    with open(video_path, "rb") as f:
-        resp = requests.put(
-            upload_url,
-            headers={
-                "Content-Range": f"bytes 0-{video_size - 1}/{video_size}",
-                "Content-Type": "video/mp4",
-            },
-            data=f,
-            timeout=600,
-        )
+    resp = upload_transport.put_file(
+        upload_url,
+        video_path,
+        headers={
+            "Content-Range": f"bytes 0-{video_size - 1}/{video_size}",
+            "Content-Type": "video/mp4",
+        },
+        timeout=deadline.timeout(600, "upload TikTok"),
+        expires=deadline.expires,
+    )
     resp.raise_for_status()
 
 
-def tt_wait_for_publish(token, publish_id, timeout=300, interval=5):
+def tt_wait_for_publish(token, publish_id, timeout=300, interval=5, deadline=NO_DEADLINE):
     """Attend que la vidéo TikTok soit publiée."""
     elapsed = 0
     while elapsed < timeout:
@@ -318,7 +547,7 @@ def tt_wait_for_publish(token, publish_id, timeout=300, interval=5):
                 "Content-Type": "application/json",
             },
             json={"publish_id": publish_id},
-            timeout=30,
+            timeout=deadline.timeout(30, "statut TikTok"),
         )
         resp.raise_for_status()
         data = resp.json()
@@ -332,27 +561,29 @@ def tt_wait_for_publish(token, publish_id, timeout=300, interval=5):
             return False
 
         print(f"  TikTok : {status}...")
-        time.sleep(interval)
+        deadline.sleep(interval, "traitement TikTok")
         elapsed += interval
 
     print("  TikTok : timeout", file=sys.stderr)
     return False
 
 
-def publish_tiktok(token, video_path, caption, thumb_offset=None):
+def publish_tiktok(token, video_path, caption, thumb_offset=None, deadline=NO_DEADLINE):
     """Flux complet de publication TikTok."""
     print("\n[TikTok]")
     video_size = os.path.getsize(video_path)
 
     print("  Initialisation...")
-    publish_id, upload_url = tt_init_upload(token, caption, video_size, thumb_offset)
+    publish_id, upload_url = tt_init_upload(
+        token, caption, video_size, thumb_offset, deadline=deadline,
+    )
 
     size_mb = video_size / (1024 * 1024)
     print(f"  Upload ({size_mb:.1f} Mo)...")
-    tt_upload_video(upload_url, video_path, video_size)
+    tt_upload_video(upload_url, video_path, video_size, deadline=deadline)
 
     print("  Traitement...")
-    if not tt_wait_for_publish(token, publish_id):
+    if not tt_wait_for_publish(token, publish_id, deadline=deadline):
         return False
 
     print(f"  OK ! Publish ID : {publish_id}")
@@ -361,9 +592,20 @@ def publish_tiktok(token, video_path, caption, thumb_offset=None):
 
 # --- YouTube ---
 
+# Credentials et client YouTube réutilisés d'une publication à l'autre (mode --watch).
+# Partagés entre les threads de --drain --jobs : lectures et mises à jour sous verrou.
+_yt_cache = {}
+_yt_lock = threading.Lock()
+
 
 def yt_get_credentials():
-    """Charge et rafraîchit les credentials YouTube depuis le token stocké."""
+    """Charge et rafraîchit les credentials YouTube depuis le token stocké.
+
+    Les credentials sont gardés en mémoire et seulement rafraîchis à expiration ; le
+    token est relu depuis le disque quand le fichier change (youtube_auth.py relancé
+    pendant un --watch, par exemple). Un seul thread à la fois rafraîchit le token,
+    réécrit par renommage atomique.
+    """
     try:
         from google.oauth2.credentials import Credentials
         from google.auth.transport.requests import Request
@@ -371,21 +613,110 @@ def yt_get_credentials():
         print("  Erreur : google-auth manquant. Lance : uv pip install -r requirements.txt", file=sys.stderr)
         return None
 
-    if not os.path.isfile(YT_TOKEN_PATH):
-        return None
+    with _yt_lock:
+        try:
+            token_mtime = os.stat(YT_TOKEN_PATH).st_mtime_ns
+        except FileNotFoundError:
+            _yt_cache.pop("creds", None)
+            return None
+        creds = _yt_cache.get("creds")
+        if creds is None or _yt_cache.get("token_mtime") != token_mtime:
+            creds = Credentials.from_authorized_user_file(YT_TOKEN_PATH, YOUTUBE_SCOPES)
+        if creds and creds.expired and creds.refresh_token:
+            creds.refresh(Request())
+            tmp_path = f"{YT_TOKEN_PATH}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(creds.to_json())
+            os.replace(tmp_path, YT_TOKEN_PATH)
+            token_mtime = os.stat(YT_TOKEN_PATH).st_mtime_ns
+        if not (creds and creds.valid):
+            _yt_cache.pop("creds", None)
+            return None
+        _yt_cache["creds"] = creds
+        _yt_cache["token_mtime"] = token_mtime
+        return creds
+
+
+def _yt_discovery_document():
+    """Retourne le document de découverte YouTube v3 (dict), stocké localement.
+
+    Le cache (YT_DISCOVERY_PATH) n'est réutilisé que s'il décrit bien youtube/v3 et a
+    été produit par la même version de google-api-python-client ; sinon il est
+    régénéré depuis le document livré avec la bibliothèque (ou téléchargé). Il est
+    écrit par renommage atomique, et un cache illisible est simplement régénéré :
+    plusieurs workers peuvent le partager.
+    """
+    from googleapiclient import discovery_cache
+    from googleapiclient.version import __version__ as library_version
+
+    try:
+        with open(YT_DISCOVERY_PATH) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        cached = None
+    if (
+        isinstance(cached, dict)
+        and cached.get("library_version") == library_version
+        and cached.get("api") == "youtube/v3"
+        and isinstance(cached.get("document"), dict)
+    ):
+        return cached["document"]
+
+    document = discovery_cache.get_static_doc("youtube", "v3")
+    if document is None:
+        resp = requests.get(YT_DISCOVERY_URL, timeout=30)
+        resp.raise_for_status()
+        document = resp.text
+    doc = json.loads(document)
+    if (doc.get("name"), doc.get("version")) != ("youtube", "v3"):
+        raise RuntimeError(f"Document de découverte inattendu : {doc.get('name')}/{doc.get('version')}")
+
+    tmp_path = f"{YT_DISCOVERY_PATH}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({
+            "api": "youtube/v3",
+            "revision": doc.get("revision"),
+            "library_version": library_version,
+            "document": doc,
+        }, f)
+    os.replace(tmp_path, YT_DISCOVERY_PATH)
+    return doc
+
+
+def yt_get_service(creds):
+    """Retourne le client YouTube, construit une seule fois par processus et par credentials."""
+    from googleapiclient.discovery import build_from_document
+
+    with _yt_lock:
+        cached = _yt_cache.get("service")
+        if cached and cached[0] is creds:
+            return cached[1]
+        service = build_from_document(_yt_discovery_document(), credentials=creds)
+        _yt_cache["service"] = (creds, service)
+        return service
+
+
+def _yt_chunk_http(creds, deadline):
+    """Transport HTTP propre à un morceau, au timeout borné par l'échéance.
+
+    Jamais celui du client partagé : httplib2.Http n'est pas thread-safe, et plusieurs
+    uploads YouTube peuvent tourner en parallèle (--drain --jobs).
+    """
+    import google_auth_httplib2
+    import httplib2
+
+    timeout = deadline.timeout(YT_CHUNK_TIMEOUT, "upload YouTube")
+    return google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http(timeout=timeout))
 
-    creds = Credentials.from_authorized_user_file(YT_TOKEN_PATH, YOUTUBE_SCOPES)
-    if creds and creds.expired and creds.refresh_token:
-        creds.refresh(Request())
-        with open(YT_TOKEN_PATH, "w") as f:
-            f.write(creds.to_json())
-    return creds if creds and creds.valid else None
 
+def publish_youtube(video_path, title, description, privacy="private", deadline=NO_DEADLINE,
+                    on_insert=None):
+    """Flux complet de publication YouTube.
 
-def publish_youtube(video_path, title, description, privacy="private"):
-    """Flux complet de publication YouTube."""
+    on_insert est appelé juste avant l'envoi de videos.insert, seul appel décompté du
+    quota YouTube : une publication annulée avant n'a rien consommé.
+    """
     try:
-        from googleapiclient.discovery import build
         from googleapiclient.http import MediaFileUpload
     except ImportError:
         print("  Erreur : google-api-python-client manquant. Lance : uv pip install -r requirements.txt", file=sys.stderr)
@@ -397,7 +728,7 @@ def publish_youtube(video_path, title, description, privacy="private"):
         print("  Erreur : pas de credentials YouTube. Lance : python youtube_auth.py", file=sys.stderr)
         return False
 
-    youtube = build("youtube", "v3", credentials=creds)
+    youtube = yt_get_service(creds)
     body = {
         "snippet": {
             "title": title,
@@ -411,12 +742,24 @@ def publish_youtube(video_path, title, description, privacy="private"):
 
     size_mb = os.path.getsize(video_path) / (1024 * 1024)
     print(f"  Upload ({size_mb:.1f} Mo)...")
-    media = MediaFileUpload(video_path, mimetype="video/mp4", resumable=True)
+    deadline.check("upload YouTube")
+    media = MediaFileUpload(
+        video_path, mimetype="video/mp4", resumable=True, chunksize=YT_CHUNK_SIZE,
+    )
     request = youtube.videos().insert(part="snippet,status", body=body, media_body=media)
 
     response = None
     while response is None:
-        status, response = request.next_chunk()
+        http = _yt_chunk_http(creds, deadline)
+        if on_insert:
+            on_insert()
+            on_insert = None
+        try:
+            status, response = request.next_chunk(http=http)
+        except TimeoutError:
+            # Timeout réduit au temps restant : s'il est écoulé, c'est une annulation.
+            deadline.check("upload YouTube")
+            raise
         if status:
             print(f"  YouTube : {int(status.progress() * 100)}%...")
 
@@ -439,15 +782,21 @@ def resolve_path(path, media_dir):
     return path
 
 
+def media_pairs(media_dir):
+    """Noms des paires .mp4 + .txt présentes dans media_dir (liste éventuellement vide)."""
+    names = os.listdir(media_dir)
+    videos = {os.path.splitext(f)[0] for f in names if f.endswith(".mp4")}
+    texts = {os.path.splitext(f)[0] for f in names if f.endswith(".txt")}
+    return sorted(videos & texts)
+
+
 def list_available_media(media_dir):
     """Liste les médias publiables (paires .mp4 + .txt) dans media_dir."""
     if not os.path.isdir(media_dir):
         print(f"Erreur : répertoire introuvable : {media_dir}", file=sys.stderr)
         sys.exit(1)
 
-    videos = {os.path.splitext(f)[0] for f in os.listdir(media_dir) if f.endswith(".mp4")}
-    texts = {os.path.splitext(f)[0] for f in os.listdir(media_dir) if f.endswith(".txt")}
-    available = sorted(videos & texts)
+    available = media_pairs(media_dir)
 
     if not available:
         print(f"Aucun média publiable dans {media_dir}", file=sys.stderr)
@@ -457,6 +806,46 @@ def list_available_media(media_dir):
     return available
 
 
+def admit_platforms(accounts, ig_token=None, deadline=NO_DEADLINE):
+    """Contrôle d'admission avant tout upload.
+
+    Retourne ({plateforme: délai} des reportées, {plateforme: instant de réservation}
+    des admises) : le quota des plateformes admises est déjà réservé (quota.admit).
+
+    L'usage Instagram est d'abord synchronisé avec content_publishing_limit ; une
+    plateforme dont le quota se libère sous QUOTA_MAX_WAIT secondes (et avant
+    l'échéance) est attendue, les autres sont reportées plutôt que de lancer un
+    upload voué au rejet. L'attente ne prend jamais plus de QUOTA_MAX_WAIT_SHARE du
+    temps restant : au-delà, les uploads qui suivent n'auraient plus le temps d'aboutir.
+    """
+    if "Instagram" in accounts:
+        try:
+            used, limit = ig_publishing_limit(accounts["Instagram"], ig_token, deadline=deadline)
+            quota.sync_live("Instagram", accounts["Instagram"], used, limit, quota.DAY)
+        except Exception as e:  # noqa: BLE001 - le décompte local reste utilisable
+            print(f"  Quota Instagram live indisponible ({e})", file=sys.stderr)
+
+    deferred, reserved = {}, {}
+    for platform, account in accounts.items():
+        now = time.time()
+        wait = quota.admit(platform, account, now=now)
+        if 0 < wait <= min(QUOTA_MAX_WAIT, deadline.remaining() * QUOTA_MAX_WAIT_SHARE):
+            print(f"Quota {platform} : attente de {wait:.0f}s...")
+            try:
+                deadline.sleep(wait, f"quota {platform}")
+            except DeadlineExceeded:
+                # Échéance trop proche pour attendre : la plateforme est reportée.
+                deferred[platform] = wait
+                continue
+            now = time.time()
+            wait = quota.admit(platform, account, now=now)
+        if wait > 0:
+            deferred[platform] = wait
+        else:
+            reserved[platform] = now
+    return deferred, reserved
+
+
 def prompt_media_choice(available):
     """Affiche la liste et demande à l'utilisateur de choisir."""
     print("Médias disponibles :\n")
@@ -483,62 +872,26 @@ def prompt_media_choice(available):
         print(f"Choix invalide, entre 0 et {len(available)}")
 
 
-def main():
-    config = load_config()
-    defaults = config.get("defaults", {})
-    media_dir = defaults.get("media_dir")
+def publish_media(video_paths, texte_path, args, defaults, lease=None, deadline=NO_DEADLINE):
+    """Publie une vidéo (ou un carrousel) et sa caption sur les plateformes sélectionnées.
 
-    parser = argparse.ArgumentParser(
-        description="Publie une vidéo sur Instagram et/ou TikTok"
-    )
-    parser.add_argument("--video", help="Chemin vers le fichier vidéo")
-    parser.add_argument("--texte", help="Chemin vers le fichier texte (caption)")
-
-    thumb = parser.add_mutually_exclusive_group()
-    thumb.add_argument(
-        "--thumbnail", help="Image de couverture (fichier local ou URL)"
-    )
-    thumb.add_argument(
-        "--thumbnail-at",
-        default=defaults.get("thumbnail_at"),
-        help="Timestamp pour la couverture (ex: 5, 0:05, 00:00:05)",
-    )
-    parser.add_argument(
-        "--platform", choices=["ig", "tt", "yt", "all"], default="all",
-        help="Plateforme cible : ig (Instagram), tt (TikTok), yt (YouTube), all (toutes)",
-    )
-    parser.add_argument(
-        "--yt-privacy", choices=["private", "unlisted", "public"], default="private",
-        help="Visibilité YouTube (défaut : private)",
-    )
-    parser.add_argument(
-        "--dry-run", action="store_true",
-        help="Simule la publication sans poster",
-    )
+    Retourne {plateforme: True/False/None (reportée)}, ou None en dry-run. Les fichiers
+    sont déplacés dans published_dir si au moins une publication a réussi et qu'aucune
+    n'est reportée : une paire reportée reste en file (son bail expire quand le quota
+    se libère, et les plateformes déjà faites n'y sont pas republiées). Lève
+    RuntimeError si la publication ne peut pas démarrer (aucune plateforme, upload
+    temporaire ou transcodage impossible).
 
-    args = parser.parse_args()
+    Avec un bail (work_queue.Lease), les plateformes déjà publiées par un worker
+    précédent sont sautées, et chaque publication réussie y est notée. Le bail est
+    revérifié avant chaque plateforme : s'il a été repris par un autre worker,
+    work_queue.LeaseLost interrompt la paire avant toute publication en double.
 
-    # Mode interactif si --video et --texte ne sont pas fournis
-    if not args.video and not args.texte:
-        if not media_dir:
-            parser.error("--video et --texte requis (ou configurer media_dir dans config.toml)")
-        chosen = prompt_media_choice(list_available_media(media_dir))
-        args.video = os.path.join(media_dir, f"{chosen}.mp4")
-        args.texte = os.path.join(media_dir, f"{chosen}.txt")
-    elif not args.video or not args.texte:
-        parser.error("--video et --texte doivent être fournis ensemble")
-
-    # Résolution des chemins via media_dir
-    args.video = resolve_path(args.video, media_dir)
-    args.texte = resolve_path(args.texte, media_dir)
-    if args.thumbnail and not args.thumbnail.startswith(("http://", "https://")):
-        args.thumbnail = resolve_path(args.thumbnail, media_dir)
-
-    # Validation des fichiers
-    if not os.path.isfile(args.video):
-        parser.error(f"Vidéo introuvable : {args.video}")
-    if not os.path.isfile(args.texte):
-        parser.error(f"Fichier texte introuvable : {args.texte}")
+    deadline borne l'ensemble : chaque plateforme reçoit une part égale du temps
+    restant quand vient son tour, si bien que le temps non consommé par l'une revient
+    aux suivantes. Une plateforme qui ne peut plus finir à temps est annulée (ECHEC).
+    """
+    carousel = len(video_paths) > 1
 
     # Plateformes disponibles
     ig_account_id = os.environ.get("INSTAGRAM_ACCOUNT_ID")
@@ -549,9 +902,21 @@ def main():
     has_tt = bool(tt_token) and args.platform in ("tt", "all")
     has_yt = os.path.isfile(YT_TOKEN_PATH) and args.platform in ("yt", "all")
 
-    if not args.dry_run and not has_ig and not has_tt and not has_yt:
-        print("Erreur : aucune plateforme configurée ou sélectionnée", file=sys.stderr)
-        sys.exit(1)
+    # Un carrousel n'existe que sur Instagram
+    if carousel and (has_tt or has_yt):
+        print("Carrousel : TikTok et YouTube ignorés (Instagram uniquement)", file=sys.stderr)
+        has_tt = has_yt = False
+
+    # Bail repris après un worker planté : ne jamais republier sur la même plateforme
+    done = lease.done if lease else set()
+    if done:
+        print(f"Déjà publié (bail repris) : {', '.join(sorted(done))}")
+        has_ig = has_ig and "Instagram" not in done
+        has_tt = has_tt and "TikTok" not in done
+        has_yt = has_yt and "YouTube" not in done
+
+    if not args.dry_run and not has_ig and not has_tt and not has_yt and not done:
+        raise RuntimeError("aucune plateforme configurée ou sélectionnée")
 
     platforms = []
     if has_ig:
@@ -561,9 +926,18 @@ def main():
     if has_yt:
         platforms.append("YouTube")
 
-    caption = read_caption(args.texte)
+    # Comptes pour le suivi des quotas (le token TikTok est haché par quota.account_key)
+    accounts = {}
+    if has_ig:
+        accounts["Instagram"] = ig_account_id
+    if has_tt:
+        accounts["TikTok"] = tt_token
+    if has_yt:
+        accounts["YouTube"] = YT_TOKEN_PATH
+
+    caption = read_caption(texte_path)
     yt_title, yt_description = parse_yt_caption(caption)
-    size_mb = os.path.getsize(args.video) / (1024 * 1024)
+    size_mb = sum(os.path.getsize(path) for path in video_paths) / (1024 * 1024)
     print(f"Caption : {caption[:80]}{'...' if len(caption) > 80 else ''}")
 
     # Thumbnail
@@ -576,17 +950,16 @@ def main():
     elif args.thumbnail:
         if args.thumbnail.startswith(("http://", "https://")):
             cover_url = args.thumbnail
-        else:
-            if not os.path.isfile(args.thumbnail):
-                parser.error(f"Image introuvable : {args.thumbnail}")
-            if not args.dry_run:
-                print("Upload de l'image de couverture...")
-                cover_url = upload_temp(args.thumbnail)
-                print(f"  OK : {cover_url}")
+        elif not args.dry_run:
+            print("Upload de l'image de couverture...")
+            cover_url = upload_temp(args.thumbnail, deadline=deadline)
+            print(f"  OK : {cover_url}")
 
     if args.dry_run:
         print(f"\n[DRY RUN] Résumé :")
-        print(f"  Vidéo      : {args.video} ({size_mb:.1f} Mo)")
+        print(f"  Vidéo      : {', '.join(video_paths)} ({size_mb:.1f} Mo)")
+        if carousel:
+            print(f"  Carrousel  : {len(video_paths)} clips")
         print(f"  Caption    : {caption[:80]}{'...' if len(caption) > 80 else ''}")
         if thumb_offset is not None:
             print(f"  Thumbnail  : frame à {thumb_offset}ms")
@@ -597,63 +970,410 @@ def main():
             print(f"  YT Desc    : {yt_description[:60]}{'...' if len(yt_description) > 60 else ''}")
             print(f"  YT Privacy : {args.yt_privacy}")
         print(f"  Plateformes: {', '.join(platforms) if platforms else 'aucune configurée'}")
+        print(f"  Transcodage: {'oui' if args.transcode else 'non'}")
+        for platform, account in accounts.items():
+            left = ", ".join(f"{r}/{n} ({label})" for label, r, n in quota.remaining(platform, account))
+            print(f"  Quota {platform:<9}: {left}")
         print(f"\nAucune publication effectuée.")
-        return
-
-    # Upload temporaire pour Instagram (TikTok upload directement)
-    video_url = None
-    if has_ig:
-        print(f"\nUpload temporaire de la vidéo ({size_mb:.1f} Mo)...")
-        video_url = upload_temp(args.video)
-        print(f"  OK : {video_url}")
+        return None
 
-    # Publication
-    results = {}
+    # Admission : on ne démarre aucun upload voué à être rejeté pour quota épuisé
+    results = {platform: True for platform in sorted(done)}
+    deferred, reserved = admit_platforms(accounts, ig_token, deadline=deadline)
+    for platform, wait in deferred.items():
+        print(
+            f"Quota {platform} épuisé : reporté (disponible dans {wait / 3600:.1f} h)",
+            file=sys.stderr,
+        )
+        results[platform] = None
+        platforms.remove(platform)
+        if lease:
+            lease.defer(wait)
+    has_ig = has_ig and "Instagram" in platforms
+    has_tt = has_tt and "TikTok" in platforms
+    has_yt = has_yt and "YouTube" in platforms
 
-    if has_ig:
-        try:
-            results["Instagram"] = publish_instagram(
-                ig_account_id, ig_token, video_url, caption,
-                thumb_offset=thumb_offset, cover_url=cover_url,
+    try:
+        # Préparation : fichiers par plateforme (les sources si elles respectent déjà le profil)
+        videos = {platform: list(video_paths) for platform in platforms}
+        if args.transcode and platforms:
+            print(f"\nTranscodage ({', '.join(platforms)})...")
+            prepared = transcode.prepare_batch(
+                [(path, p) for p in platforms for path in video_paths],
+                expires=None if deadline.expires == float("inf") else deadline.expires,
             )
-        except Exception as e:
-            print(f"  Instagram ECHEC : {e}", file=sys.stderr)
-            results["Instagram"] = False
+            for platform in platforms:
+                videos[platform] = [prepared[(path, platform)] for path in video_paths]
+                for src, path in zip(video_paths, videos[platform]):
+                    if path != src:
+                        size = os.path.getsize(path) / (1024 * 1024)
+                        print(f"  {platform} : {os.path.basename(src)} -> {size:.1f} Mo")
+
+        def still_ours(platform):
+            """Revérifie le bail avant de publier : faux si un autre worker a publié entre-temps."""
+            nonlocal pending
+            if not lease:
+                return True
+            lease.check()
+            if platform in lease.done:
+                print(f"\n[{platform}] déjà publié par un autre worker")
+                results[platform] = True
+                pending -= 1
+                return False
+            return True
 
-    if has_tt:
-        try:
-            results["TikTok"] = publish_tiktok(
-                tt_token, args.video, caption, thumb_offset=thumb_offset,
-            )
-        except Exception as e:
-            print(f"  TikTok ECHEC : {e}", file=sys.stderr)
-            results["TikTok"] = False
-
-    if has_yt:
-        try:
-            results["YouTube"] = publish_youtube(
-                args.video, yt_title, yt_description, privacy=args.yt_privacy,
-            )
-        except Exception as e:
-            print(f"  YouTube ECHEC : {e}", file=sys.stderr)
-            results["YouTube"] = False
+        # Upload temporaire pour Instagram (TikTok upload directement ;
+        # un carrousel uploade ses clips en parallèle pendant la publication)
+        video_url = None
+        pending = len(platforms)
+        has_ig = has_ig and still_ours("Instagram")
+        if has_ig:
+            ig_deadline = deadline.share(pending)
+        if has_ig and not carousel:
+            ig_size_mb = os.path.getsize(videos["Instagram"][0]) / (1024 * 1024)
+            print(f"\nUpload temporaire de la vidéo ({ig_size_mb:.1f} Mo)...")
+            try:
+                video_url = upload_temp(videos["Instagram"][0], deadline=ig_deadline)
+            except DeadlineExceeded as e:
+                print(f"  Instagram ANNULÉ : {e}", file=sys.stderr)
+                results["Instagram"] = False
+                has_ig = False
+                pending -= 1
+            else:
+                print(f"  OK : {video_url}")
+
+        # Publication
+        if has_ig:
+            try:
+                if carousel:
+                    results["Instagram"] = publish_instagram_carousel(
+                        ig_account_id, ig_token, videos["Instagram"], caption,
+                        deadline=ig_deadline,
+                    )
+                else:
+                    results["Instagram"] = publish_instagram(
+                        ig_account_id, ig_token, video_url, caption,
+                        thumb_offset=thumb_offset, cover_url=cover_url, deadline=ig_deadline,
+                    )
+            except DeadlineExceeded as e:
+                print(f"  Instagram ANNULÉ : {e}", file=sys.stderr)
+                results["Instagram"] = False
+            except Exception as e:
+                print(f"  Instagram ECHEC : {e}", file=sys.stderr)
+                results["Instagram"] = False
+            if results["Instagram"]:
+                reserved.pop("Instagram")
+                if lease:
+                    lease.mark_done("Instagram")
+            pending -= 1
+
+        if has_tt and still_ours("TikTok"):
+            try:
+                results["TikTok"] = publish_tiktok(
+                    tt_token, videos["TikTok"][0], caption, thumb_offset=thumb_offset,
+                    deadline=deadline.share(pending),
+                )
+            except DeadlineExceeded as e:
+                print(f"  TikTok ANNULÉ : {e}", file=sys.stderr)
+                results["TikTok"] = False
+            except Exception as e:
+                print(f"  TikTok ECHEC : {e}", file=sys.stderr)
+                results["TikTok"] = False
+            # La limite de débit porte sur l'appel init, réussi ou non.
+            reserved.pop("TikTok")
+            if lease and results["TikTok"]:
+                lease.mark_done("TikTok")
+            pending -= 1
+
+        if has_yt and still_ours("YouTube"):
+            try:
+                results["YouTube"] = publish_youtube(
+                    videos["YouTube"][0], yt_title, yt_description, privacy=args.yt_privacy,
+                    deadline=deadline.share(pending),
+                    on_insert=lambda: reserved.pop("YouTube"),
+                )
+            except DeadlineExceeded as e:
+                print(f"  YouTube ANNULÉ : {e}", file=sys.stderr)
+                results["YouTube"] = False
+            except Exception as e:
+                print(f"  YouTube ECHEC : {e}", file=sys.stderr)
+                results["YouTube"] = False
+            # videos.insert est décompté du quota même en cas d'échec (réservation
+            # consommée par on_insert) ; annulé avant l'envoi, il est rendu plus bas.
+            if lease and results["YouTube"]:
+                lease.mark_done("YouTube")
+    finally:
+        # Quota réservé mais jamais consommé (échec en amont, annulation) : on le rend.
+        for platform, reserved_at in reserved.items():
+            quota.cancel(platform, accounts[platform], reserved_at)
 
     # Résumé
     print(f"\n--- Résumé ---")
     for platform, success in results.items():
-        print(f"  {platform} : {'OK' if success else 'ECHEC'}")
-
-    # Déplacement seulement si au moins une publication a réussi
-    if any(results.values()):
+        print(f"  {platform} : {'REPORTÉ' if success is None else 'OK' if success else 'ECHEC'}")
+
+    deferred = [platform for platform, success in results.items() if success is None]
+    if deferred and any(results.values()):
+        print(f"  Non déplacé : publication reportée sur {', '.join(deferred)}")
+        if not lease:
+            retry = " / ".join(f"--platform {PLATFORM_CODES[p]}" for p in deferred)
+            print(f"  Relancer plus tard avec {retry}")
+
+    # Déplacement seulement si au moins une publication a réussi et aucune n'est reportée
+    if any(results.values()) and not deferred:
+        if lease:
+            lease.check()
         published_dir = defaults.get("published_dir")
         if published_dir:
             os.makedirs(published_dir, exist_ok=True)
-            for path in (args.video, args.texte):
+            for path in (*video_paths, texte_path):
                 dest = os.path.join(published_dir, os.path.basename(path))
                 shutil.move(path, dest)
                 print(f"  Déplacé : {os.path.basename(path)} -> Published/")
 
-    if not all(results.values()):
+    return results
+
+
+def publish_claimed(media_dir, name, args, defaults, deadline=NO_DEADLINE):
+    """Réserve la paire name dans la file partagée puis la publie.
+
+    Retourne le résultat de publish_media, False en cas d'erreur (y compris un volume
+    partagé inaccessible pendant la réservation), ou None si la paire est déjà prise
+    par un autre worker.
+    """
+    try:
+        lease = work_queue.claim(media_dir, name)
+    except OSError as e:
+        # ESTALE, EACCES… sur le volume partagé : la paire échoue, pas le mode --watch/--drain.
+        print(f"\n=== {name} : réservation impossible ({e}) ===", file=sys.stderr)
+        return False
+    if lease is None:
+        print(f"\n=== {name} : pris par un autre worker ===")
+        return None
+
+    print(f"\n=== {name} ===")
+    results = False
+    try:
+        results = publish_media(
+            [os.path.join(media_dir, f"{name}.mp4")],
+            os.path.join(media_dir, f"{name}.txt"),
+            args, defaults, lease=lease, deadline=deadline,
+        )
+    except work_queue.LeaseLost as e:
+        # Le nouveau propriétaire du bail termine la paire.
+        print(f"Abandon : {e}", file=sys.stderr)
+        results = None
+    except Exception as e:  # noqa: BLE001 - une paire en échec n'arrête pas les suivantes
+        print(f"Erreur : {e}", file=sys.stderr)
+    finally:
+        # Échec : rien de publié, rien de reporté, et au moins une erreur. Une paire
+        # avec des plateformes reportées (quota) garde son bail jusqu'à leur admission.
+        failed = results is False or (
+            bool(results) and not any(results.values())
+            and None not in results.values() and False in results.values()
+        )
+        try:
+            lease.release(failed=failed)
+        except OSError as e:
+            # Bail laissé en place : il expirera et la paire sera reprise.
+            print(f"  Libération du bail impossible : {e}", file=sys.stderr)
+    return results
+
+
+def drain_media(media_dir, args, defaults, batch_deadline=NO_DEADLINE, jobs=1):
+    """Mode --drain : publie toutes les paires de media_dir, jobs paires à la fois.
+
+    Plusieurs workers (processus ou machines partageant media_dir) peuvent tourner
+    en même temps : chaque paire n'est publiée que par celui qui la réserve. Avec
+    jobs > 1, ce processus mène lui-même plusieurs paires de front (uploads et
+    vérifications des URLs temporaires en parallèle), avec les mêmes baux.
+    Chaque paire dispose de --deadline secondes, sans dépasser l'échéance du lot ;
+    une fois celle-ci atteinte, les paires restantes sont laissées au prochain passage.
+    Retourne True si toutes les publications tentées ont réussi.
+    """
+    available = media_pairs(media_dir)
+    if not available:
+        # File vide : état normal pour un worker, rien à faire.
+        print(f"Aucun média à publier dans {media_dir}")
+        return True
+
+    skipped = []
+
+    def drain_one(name):
+        try:
+            batch_deadline.check(f"la paire {name}")
+        except DeadlineExceeded:
+            skipped.append(name)
+            return None
+        return publish_claimed(
+            media_dir, name, args, defaults, deadline=batch_deadline.child(args.deadline),
+        )
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        outcomes = list(pool.map(drain_one, available))
+    if skipped:
+        print(f"\nDélai du lot atteint : {len(skipped)} paire(s) non traitée(s)")
+        return False
+    return not any(
+        results is False or (results and not all(results.values())) for results in outcomes
+    )
+
+
+def watch_media(media_dir, args, defaults):
+    """Mode --watch : publie chaque nouvelle paire .mp4/.txt dès qu'elle est complète.
+
+    Une paire réservée par un autre worker est réexaminée à l'expiration de son bail :
+    si ce worker a planté entre-temps, elle est reprise ici.
+    """
+    def on_pair(name):
+        publish_claimed(media_dir, name, args, defaults, deadline=Deadline(args.deadline))
+        try:
+            return work_queue.retry_delay(media_dir, name)
+        except OSError as e:
+            # Baux illisibles pour l'instant : la paire est réexaminée plus tard.
+            print(f"  Baux illisibles pour {name} : {e}", file=sys.stderr)
+            return work_queue.HEARTBEAT_INTERVAL
+
+    print(f"Surveillance de {media_dir} (Ctrl-C pour arrêter)...")
+    try:
+        watch.watch(media_dir, on_pair, poll=defaults.get("watch_poll", False))
+    except KeyboardInterrupt:
+        print("\nArrêt de la surveillance.")
+
+
+def main():
+    config = load_config()
+    defaults = config.get("defaults", {})
+    media_dir = defaults.get("media_dir")
+
+    parser = argparse.ArgumentParser(
+        description="Publie une vidéo sur Instagram et/ou TikTok"
+    )
+    parser.add_argument(
+        "--video", nargs="+",
+        help="Chemin vers le fichier vidéo (plusieurs : carrousel Instagram)",
+    )
+    parser.add_argument("--texte", help="Chemin vers le fichier texte (caption)")
+
+    thumb = parser.add_mutually_exclusive_group()
+    thumb.add_argument(
+        "--thumbnail", help="Image de couverture (fichier local ou URL)"
+    )
+    thumb.add_argument(
+        "--thumbnail-at",
+        help="Timestamp pour la couverture (ex: 5, 0:05, 00:00:05 ; défaut : thumbnail_at de config.toml)",
+    )
+    parser.add_argument(
+        "--platform", choices=["ig", "tt", "yt", "all"], default="all",
+        help="Plateforme cible : ig (Instagram), tt (TikTok), yt (YouTube), all (toutes)",
+    )
+    parser.add_argument(
+        "--yt-privacy", choices=["private", "unlisted", "public"], default="private",
+        help="Visibilité YouTube (défaut : private)",
+    )
+    parser.add_argument(
+        "--transcode", action="store_true", default=defaults.get("transcode", False),
+        help="Ré-encode la vidéo (ffmpeg) selon le profil de chaque plateforme",
+    )
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="Surveille media_dir et publie chaque nouvelle paire .mp4/.txt dès son arrivée",
+    )
+    parser.add_argument(
+        "--drain", action="store_true",
+        help="Publie toutes les paires de media_dir (plusieurs workers possibles en parallèle)",
+    )
+    parser.add_argument(
+        "--jobs", type=int, metavar="N",
+        help="Avec --drain : nombre de paires publiées de front par ce processus (défaut : 1)",
+    )
+    parser.add_argument(
+        "--deadline", type=float, metavar="SECONDES", default=defaults.get("deadline"),
+        help="Durée maximale de publication d'un média, toutes plateformes comprises",
+    )
+    parser.add_argument(
+        "--batch-deadline", type=float, metavar="SECONDES",
+        help="Durée maximale d'un passage --drain (défaut : batch_deadline de config.toml)",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="Simule la publication sans poster",
+    )
+
+    args = parser.parse_args()
+    if args.batch_deadline is not None and not args.drain:
+        parser.error("--batch-deadline ne s'applique qu'avec --drain")
+    if args.batch_deadline is None:
+        args.batch_deadline = defaults.get("batch_deadline")
+    if args.jobs is not None and not args.drain:
+        parser.error("--jobs ne s'applique qu'avec --drain")
+    if args.jobs is None:
+        args.jobs = defaults.get("jobs", 1)
+    if args.jobs < 1:
+        parser.error("--jobs doit être au moins 1")
+
+    # Un carrousel n'a pas de couverture réglable : on refuse plutôt que d'ignorer.
+    if args.video and len(args.video) > 1:
+        if args.thumbnail or args.thumbnail_at:
+            parser.error("--thumbnail et --thumbnail-at ne s'appliquent pas à un carrousel")
+    elif not args.thumbnail and args.thumbnail_at is None:
+        args.thumbnail_at = defaults.get("thumbnail_at")
+
+    if args.watch or args.drain:
+        mode = "--watch" if args.watch else "--drain"
+        if args.watch and args.drain:
+            parser.error("--watch et --drain sont incompatibles")
+        if args.video or args.texte or args.thumbnail:
+            parser.error(f"{mode} est incompatible avec --video, --texte et --thumbnail")
+        if not media_dir or not defaults.get("published_dir"):
+            parser.error(f"{mode} requiert media_dir et published_dir dans config.toml")
+        if not os.path.isdir(media_dir):
+            parser.error(f"Répertoire introuvable : {media_dir}")
+        if args.watch:
+            watch_media(media_dir, args, defaults)
+        elif not drain_media(
+            media_dir, args, defaults, Deadline(args.batch_deadline), jobs=args.jobs,
+        ):
+            sys.exit(1)
+        return
+
+    # Mode interactif si --video et --texte ne sont pas fournis
+    if not args.video and not args.texte:
+        if not media_dir:
+            parser.error("--video et --texte requis (ou configurer media_dir dans config.toml)")
+        chosen = prompt_media_choice(list_available_media(media_dir))
+        args.video = [os.path.join(media_dir, f"{chosen}.mp4")]
+        args.texte = os.path.join(media_dir, f"{chosen}.txt")
+    elif not args.video or not args.texte:
+        parser.error("--video et --texte doivent être fournis ensemble")
+
+    # Résolution des chemins via media_dir
+    args.video = [resolve_path(path, media_dir) for path in args.video]
+    args.texte = resolve_path(args.texte, media_dir)
+    if args.thumbnail and not args.thumbnail.startswith(("http://", "https://")):
+        args.thumbnail = resolve_path(args.thumbnail, media_dir)
+
+    # Validation des fichiers
+    for path in args.video:
+        if not os.path.isfile(path):
+            parser.error(f"Vidéo introuvable : {path}")
+    if len(args.video) > IG_CAROUSEL_MAX_ITEMS:
+        parser.error(f"Carrousel limité à {IG_CAROUSEL_MAX_ITEMS} vidéos")
+    if not os.path.isfile(args.texte):
+        parser.error(f"Fichier texte introuvable : {args.texte}")
+    if args.thumbnail and not args.thumbnail.startswith(("http://", "https://")):
+        if not os.path.isfile(args.thumbnail):
+            parser.error(f"Image introuvable : {args.thumbnail}")
+
+    try:
+        results = publish_media(
+            args.video, args.texte, args, defaults, deadline=Deadline(args.deadline),
+        )
+    except RuntimeError as e:
+        print(f"Erreur : {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if results is not None and not all(results.values()):
         sys.exit(1)
 
 
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""Contrôle d'admission : suivi local des quotas de publication par plateforme et compte.
+
+Le décompte est propre à la machine : STATE_PATH est à côté du script et protégé par
+fcntl.flock, qui n'est pas fiable sur un volume réseau. Avec des workers sur plusieurs
+machines, chacune ne compte que ses propres publications ; seul l'usage Instagram
+rapporté par l'API (sync_live) reflète toutes les machines.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "quota_state.json")
+DAY = 24 * 3600
+# Le quota de l'API YouTube Data est remis à zéro à minuit, heure du Pacifique.
+YT_QUOTA_TZ = ZoneInfo("America/Los_Angeles")
+
+# Fenêtres de limitation par plateforme : (libellé, durée en s ou "pacific_day", limite).
+# Une publication n'est admise que si elle tient dans TOUTES les fenêtres.
+LIMITS = {
+    # 10 000 unités/jour par projet, videos.insert en coûte 1 600.
+    "YouTube": [("jour", "pacific_day", 10000)],
+    # content_publishing_limit : 100 publications / 24 h glissantes (un carrousel compte pour 1).
+    # Valeur de repli hors ligne : quota_total, lu en direct, fait foi.
+    "Instagram": [("24 h", DAY, 100)],
+    # post/publish/video/init/ : 6 requêtes/min par token, ~15 publications/jour par créateur.
+    "TikTok": [("minute", 60, 6), ("24 h", DAY, 15)],
+}
+COSTS = {"YouTube": 1600, "Instagram": 1, "TikTok": 1}
+
+
+def account_key(platform, account):
+    """Clé de stockage : les tokens sont hachés pour ne jamais être écrits en clair."""
+    digest = hashlib.sha256(str(account).encode()).hexdigest()[:12]
+    return f"{platform}:{digest}"
+
+
+@contextmanager
+def _locked_state():
+    """Ouvre l'état sous verrou exclusif (plusieurs processus peuvent publier en parallèle)."""
+    with open(f"{STATE_PATH}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        state = {}
+        if os.path.exists(STATE_PATH):
+            with open(STATE_PATH) as f:
+                state = json.load(f)
+        yield state
+        tmp_path = f"{STATE_PATH}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, STATE_PATH)
+
+
+def _window_start(window, now):
+    """Début de la fenêtre courante (timestamp) et instant où elle libère de la place."""
+    if window == "pacific_day":
+        local = datetime.fromtimestamp(now, YT_QUOTA_TZ)
+        midnight = local.replace(hour=0, minute=0, second=0, microsecond=0)
+        return midnight.timestamp(), (midnight + timedelta(days=1)).timestamp()
+    return now - window, None
+
+
+def _usage(entry, window, now):
+    """Consommation dans la fenêtre : événements locaux, ou usage live s'il est plus élevé."""
+    start, _ = _window_start(window, now)
+    used = sum(cost for ts, cost in entry.get("events", []) if ts > start)
+    live = entry.get("live")
+    if live and live.get("window") == window and live["at"] > start:
+        # L'usage live inclut les publications faites hors de cet outil.
+        after = sum(c for ts, c in entry.get("events", []) if ts > live["at"])
+        used = max(used, live["used"] + after)
+    return used
+
+
+def _limit(entry, window, default):
+    """Limite de la fenêtre : celle rapportée par la plateforme si connue."""
+    live = entry.get("live")
+    if live and live.get("window") == window and live.get("limit"):
+        return live["limit"]
+    return default
+
+
+def remaining(platform, account, now=None):
+    """Quota restant par fenêtre : liste de (libellé, restant, limite)."""
+    now = now or time.time()
+    with _locked_state() as state:
+        entry = state.get(account_key(platform, account), {})
+    out = []
+    for label, window, default in LIMITS[platform]:
+        limit = _limit(entry, window, default)
+        out.append((label, limit - _usage(entry, window, now), limit))
+    return out
+
+
+def _horizon(platform, now):
+    """Instant avant lequel les événements ne comptent plus dans aucune fenêtre."""
+    return now - max(DAY if w == "pacific_day" else w for _, w, _ in LIMITS[platform])
+
+
+def _admission_wait(platform, entry, cost, now):
+    """Délai (s) avant que cost tienne dans toutes les fenêtres de la plateforme."""
+    wait = 0
+    for _, window, default in LIMITS[platform]:
+        limit = _limit(entry, window, default)
+        excess = _usage(entry, window, now) + cost - limit
+        if excess <= 0:
+            continue
+        start, reset = _window_start(window, now)
+        if reset is not None:
+            wait = max(wait, reset - now)
+            continue
+        # Fenêtre glissante : on attend l'expiration des plus anciens événements.
+        freed = 0
+        events = sorted(e for e in entry.get("events", []) if e[0] > start)
+        release = now + window
+        for ts, c in events:
+            freed += c
+            if freed >= excess:
+                release = ts + window
+                break
+        wait = max(wait, release - now)
+    return wait
+
+
+def admit(platform, account, cost=None, now=None):
+    """Admet une publication et réserve son quota. Retourne 0, ou le délai (s) avant admission.
+
+    La vérification et la réservation se font sous le même verrou : deux workers ne
+    peuvent pas prendre la même dernière place. Une réservation qui n'a finalement rien
+    consommé (publication annulée avant l'appel décompté) est rendue par cancel(now).
+    Le délai correspond au moment où assez d'événements sortent de la fenêtre la plus
+    contraignante (ou à la remise à zéro quotidienne YouTube).
+    """
+    cost = COSTS[platform] if cost is None else cost
+    now = now or time.time()
+    with _locked_state() as state:
+        entry = state.get(account_key(platform, account), {})
+        wait = _admission_wait(platform, entry, cost, now)
+        if not wait:
+            entry = state.setdefault(account_key(platform, account), {})
+            horizon = _horizon(platform, now)
+            entry["events"] = [e for e in entry.get("events", []) if e[0] > horizon] + [[now, cost]]
+    return wait
+
+
+def cancel(platform, account, reserved_at):
+    """Rend une réservation faite par admit (identifiée par son instant)."""
+    with _locked_state() as state:
+        entry = state.get(account_key(platform, account), {})
+        events = entry.get("events", [])
+        for i, (ts, _) in enumerate(events):
+            if ts == reserved_at:
+                del events[i]
+                break
+
+
+def sync_live(platform, account, used, limit, window, now=None):
+    """Mémorise l'usage rapporté par la plateforme (prioritaire sur le décompte local)."""
+    now = now or time.time()
+    with _locked_state() as state:
+        entry = state.setdefault(account_key(platform, account), {"events": []})
+        entry["live"] = {"used": used, "limit": limit, "window": window, "at": now}
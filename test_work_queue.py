@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Tests du protocole de baux de work_queue (réservation, reprise, perte, échec)."""
+
+import os
+
+import pytest
+
+import work_queue
+
+
+@pytest.fixture
+def media_dir(tmp_path):
+    for ext in (".mp4", ".txt"):
+        (tmp_path / f"clip{ext}").write_bytes(b"data")
+    return str(tmp_path)
+
+
+@pytest.fixture
+def leases():
+    """Libère en fin de test les baux encore détenus (arrêt des heartbeats)."""
+    held = []
+    yield held
+    for lease in held:
+        lease.release()
+
+
+def _expire(lease):
+    """Simule un worker planté : son bail n'est plus renouvelé et expire."""
+    lease._stop.set()
+    lease.state["expires"] = 0
+    lease._write()
+
+
+def test_claim_is_exclusive(media_dir, leases):
+    lease = work_queue.claim(media_dir, "clip")
+    assert lease is not None
+    leases.append(lease)
+    assert work_queue.claim(media_dir, "clip") is None
+
+
+def test_claim_missing_pair(media_dir):
+    assert work_queue.claim(media_dir, "absent") is None
+    assert work_queue._generations(media_dir, "absent") == []
+
+
+def test_release_frees_pair(media_dir, leases):
+    work_queue.claim(media_dir, "clip").release()
+    assert work_queue._generations(media_dir, "clip") == []
+    lease = work_queue.claim(media_dir, "clip")
+    assert lease is not None
+    leases.append(lease)
+
+
+def test_expired_lease_is_taken_over_with_done(media_dir, leases):
+    first = work_queue.claim(media_dir, "clip")
+    first.mark_done("Instagram")
+    _expire(first)
+
+    second = work_queue.claim(media_dir, "clip")
+    assert second is not None
+    leases.append(second)
+    assert second.state["gen"] == first.state["gen"] + 1
+    assert second.done == {"Instagram"}
+    # Un seul repreneur par génération.
+    assert work_queue.claim(media_dir, "clip") is None
+
+
+def test_lost_lease_cannot_publish_or_overwrite(media_dir, leases):
+    first = work_queue.claim(media_dir, "clip")
+    _expire(first)
+    second = work_queue.claim(media_dir, "clip")
+    leases.append(second)
+
+    with pytest.raises(work_queue.LeaseLost):
+        first.check()
+    assert first.lost
+    # Le renouvellement de l'ancien propriétaire ne touche jamais le bail du nouveau.
+    before = work_queue._read_lease(second.path)
+    first._renew()
+    assert work_queue._read_lease(second.path) == before
+    first.release()
+    assert os.path.exists(second.path)
+    second.check()
+
+
+def test_late_mark_done_reaches_successor(media_dir, leases):
+    first = work_queue.claim(media_dir, "clip")
+    _expire(first)
+    second = work_queue.claim(media_dir, "clip")
+    leases.append(second)
+
+    first.mark_done("TikTok")
+    second.check()
+    assert "TikTok" in second.done
+
+
+def test_lease_lost_after_successor_finished(media_dir):
+    first = work_queue.claim(media_dir, "clip")
+    _expire(first)
+    work_queue.claim(media_dir, "clip").release()
+
+    with pytest.raises(work_queue.LeaseLost):
+        first.check()
+    first.release()
+
+
+def test_failed_pair_retried_only_when_files_change(media_dir):
+    lease = work_queue.claim(media_dir, "clip")
+    lease.mark_done("YouTube")
+    lease.release(failed=True)
+    assert work_queue.claim(media_dir, "clip") is None
+
+    with open(os.path.join(media_dir, "clip.txt"), "a") as f:
+        f.write(" modifié")
+    retry = work_queue.claim(media_dir, "clip")
+    assert retry is not None
+    assert retry.done == {"YouTube"}
+    retry.release()
+    assert work_queue._generations(media_dir, "clip") == []
+
+
+def test_retry_delay(media_dir):
+    assert work_queue.retry_delay(media_dir, "clip") is None
+    lease = work_queue.claim(media_dir, "clip")
+    assert 0 < work_queue.retry_delay(media_dir, "clip") <= work_queue.LEASE_TTL
+    lease.release(failed=True)
+    assert work_queue.retry_delay(media_dir, "clip") is None
+
+
+def test_deferred_pair_kept_until_quota_frees(media_dir):
+    lease = work_queue.claim(media_dir, "clip")
+    lease.mark_done("TikTok")
+    lease.defer(3600)
+    lease.defer(60)
+    lease.release()
+    assert work_queue.claim(media_dir, "clip") is None
+    assert 0 < work_queue.retry_delay(media_dir, "clip") <= 60
+
+    state = work_queue._read_lease(lease.path)
+    state["expires"] = 0
+    work_queue._write_lease(lease.path, state)
+    retry = work_queue.claim(media_dir, "clip")
+    assert retry is not None
+    assert retry.done == {"TikTok"}
+    retry.release()
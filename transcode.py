@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""Préparation des vidéos : ré-encodage ffmpeg par plateforme, avec cache par contenu."""
+
+import hashlib
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".transcode_cache")
+FFMPEG_BIN = os.environ.get("FFMPEG_BIN", "ffmpeg")
+FFPROBE_BIN = os.environ.get("FFPROBE_BIN", "ffprobe")
+HASH_CHUNK = 1024 * 1024
+# Taille maximale du cache : au-delà, les sorties les moins récemment utilisées sont supprimées.
+CACHE_MAX_MB = int(os.environ.get("TRANSCODE_CACHE_MAX_MB", 10 * 1024))
+# Sorties partielles (ffmpeg interrompu, processus tué) supprimées au-delà de cet âge.
+PART_MAX_AGE = 24 * 3600
+# Marge sous la taille cible : le débit réel de x264 déborde légèrement de -b:v.
+SIZE_MARGIN = 0.92
+
+# Profils cibles par plateforme. Les dimensions sont exprimées en côté long / côté
+# court pour s'appliquer aussi bien aux vidéos verticales qu'horizontales.
+PROFILES = {
+    # max_size_mb doit rester sous TEMP_MAX_SIZE_MB (hébergeurs temporaires).
+    "Instagram": {"long_side": 1920, "short_side": 1080, "max_fps": 60,
+                  "video_kbps": 8000, "audio_kbps": 128, "max_size_mb": 200},
+    "TikTok": {"long_side": 1920, "short_side": 1080, "max_fps": 60,
+               "video_kbps": 10000, "audio_kbps": 128, "max_size_mb": 500},
+    "YouTube": {"long_side": 3840, "short_side": 2160, "max_fps": 60,
+                "video_kbps": 35000, "audio_kbps": 192, "max_size_mb": None},
+}
+
+
+def probe(path):
+    """Retourne durée, dimensions, fps, codec et débit d'une vidéo via ffprobe."""
+    try:
+        out = subprocess.run(
+            [FFPROBE_BIN, "-v", "error", "-print_format", "json",
+             "-show_format", "-show_streams", "-select_streams", "v:0", path],
+            capture_output=True, check=True, text=True,
+        ).stdout
+    except FileNotFoundError as exc:
+        raise RuntimeError(f"ffprobe introuvable ({FFPROBE_BIN}), installe ffmpeg") from exc
+    except subprocess.CalledProcessError as exc:
+        raise RuntimeError(f"ffprobe : {exc.stderr.strip()}") from exc
+
+    data = json.loads(out)
+    if not data.get("streams"):
+        raise RuntimeError(f"Aucun flux vidéo dans {path}")
+    stream = data["streams"][0]
+    num, _, den = stream.get("avg_frame_rate", "0/1").partition("/")
+    fps = float(num) / float(den) if den and float(den) else 0.0
+    return {
+        "duration": float(data["format"].get("duration", 0)),
+        "width": int(stream["width"]),
+        "height": int(stream["height"]),
+        "fps": fps,
+        "codec": stream.get("codec_name"),
+        "kbps": int(data["format"].get("bit_rate", 0)) // 1000,
+    }
+
+
+def file_digest(path):
+    """Empreinte SHA-256 du contenu du fichier (clé de cache)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _target_size(width, height, profile):
+    """Dimensions paires tenant dans le profil, sans agrandir ni déformer."""
+    long_in, short_in = max(width, height), min(width, height)
+    scale = min(1.0, profile["long_side"] / long_in, profile["short_side"] / short_in)
+    return int(width * scale) // 2 * 2, int(height * scale) // 2 * 2
+
+
+def _target_video_kbps(info, profile):
+    """Débit vidéo : plafond du profil, réduit si nécessaire pour tenir en max_size_mb."""
+    kbps = profile["video_kbps"]
+    if profile["max_size_mb"] and info["duration"] > 0:
+        budget = profile["max_size_mb"] * 8 * 1024 * SIZE_MARGIN / info["duration"]
+        kbps = min(kbps, int(budget) - profile["audio_kbps"])
+    if kbps <= 0:
+        raise RuntimeError(
+            f"Vidéo trop longue pour tenir en {profile['max_size_mb']} Mo "
+            f"({info['duration']:.0f} s)"
+        )
+    return kbps
+
+
+def needs_transcode(path, info, profile):
+    """Indique si le fichier source sort du profil (taille, débit, résolution, codec)."""
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    if profile["max_size_mb"] and size_mb > profile["max_size_mb"]:
+        return True
+    if info["kbps"] > profile["video_kbps"] + profile["audio_kbps"]:
+        return True
+    if (info["width"], info["height"]) != _target_size(info["width"], info["height"], profile):
+        return True
+    if info["fps"] > profile["max_fps"]:
+        return True
+    return info["codec"] != "h264"
+
+
+def transcode(src, platform, threads=0, expires=None, digest=None, info=None):
+    """Prépare src pour la plateforme. Retourne le chemin à publier.
+
+    Le fichier source est retourné tel quel s'il respecte déjà le profil ; sinon la
+    sortie ffmpeg est rangée dans CACHE_DIR sous une clé (contenu + profil) : une même
+    source n'est jamais ré-encodée deux fois. expires est une échéance absolue
+    (time.monotonic) : ffmpeg est interrompu quand elle tombe, quel que soit le moment
+    où le job a démarré. digest et info (empreinte et probe de src) évitent de les
+    recalculer quand l'appelant les a déjà.
+    """
+    profile = PROFILES[platform]
+    info = info or probe(src)
+    if not needs_transcode(src, info, profile):
+        return src
+
+    profile_key = hashlib.sha256(json.dumps(profile, sort_keys=True).encode()).hexdigest()[:12]
+    out_path = os.path.join(CACHE_DIR, f"{digest or file_digest(src)}-{profile_key}.mp4")
+    if os.path.isfile(out_path):
+        # Date de dernier usage, pour l'éviction (prune_cache).
+        os.utime(out_path)
+        return out_path
+
+    width, height = _target_size(info["width"], info["height"], profile)
+    kbps = _target_video_kbps(info, profile)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{out_path}.{os.getpid()}.part.mp4"
+    cmd = [
+        FFMPEG_BIN, "-y", "-v", "error", "-i", src,
+        "-vf", f"scale={width}:{height}",
+        "-c:v", "libx264", "-preset", "medium", "-pix_fmt", "yuv420p",
+        "-b:v", f"{kbps}k", "-maxrate", f"{kbps}k", "-bufsize", f"{kbps * 2}k",
+        "-c:a", "aac", "-b:a", f"{profile['audio_kbps']}k", "-ac", "2",
+        "-movflags", "+faststart", "-threads", str(threads),
+    ]
+    if info["fps"] > profile["max_fps"]:
+        cmd += ["-r", str(profile["max_fps"])]
+    cmd.append(tmp_path)
+
+    # L'horloge monotone est commune aux processus d'une même machine.
+    timeout = None if expires is None else expires - time.monotonic()
+    if timeout is not None and timeout <= 0:
+        raise RuntimeError("délai dépassé avant le démarrage de ffmpeg")
+    try:
+        subprocess.run(cmd, capture_output=True, check=True, text=True, timeout=timeout)
+    except FileNotFoundError as exc:
+        raise RuntimeError(f"ffmpeg introuvable ({FFMPEG_BIN}), installe ffmpeg") from exc
+    except subprocess.TimeoutExpired as exc:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise RuntimeError(f"ffmpeg interrompu après {timeout:.0f}s (délai dépassé)") from exc
+    except subprocess.CalledProcessError as exc:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise RuntimeError(f"ffmpeg : {exc.stderr.strip()}") from exc
+    # Renommage atomique : un cache partiel n'est jamais visible.
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def _inspect(src, platforms):
+    """Probe de src, et son empreinte seulement si une plateforme impose un ré-encodage."""
+    info = probe(src)
+    needed = [p for p in platforms if needs_transcode(src, info, PROFILES[p])]
+    return info, needed, file_digest(src) if needed else None
+
+
+def prune_cache(max_mb=CACHE_MAX_MB, keep=()):
+    """Ramène CACHE_DIR sous max_mb en supprimant les sorties les moins récemment utilisées.
+
+    Les chemins de keep (sorties du lot en cours) ne sont jamais supprimés, ni les
+    sorties partielles récentes (ffmpeg en cours dans un autre processus).
+    """
+    try:
+        entries = list(os.scandir(CACHE_DIR))
+    except FileNotFoundError:
+        return
+    now = time.time()
+    outputs = []
+    for entry in entries:
+        st = entry.stat()
+        if entry.name.endswith(".part.mp4"):
+            if now - st.st_mtime > PART_MAX_AGE:
+                os.remove(entry.path)
+        elif entry.name.endswith(".mp4"):
+            outputs.append((st.st_mtime, st.st_size, entry.path))
+
+    total = sum(size for _, size, _ in outputs)
+    for _, size, path in sorted(outputs):
+        if total <= max_mb * 1024 * 1024:
+            break
+        if path in keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def prepare_batch(jobs, workers=None, expires=None):
+    """Transcode une liste de (chemin, plateforme) en parallèle sur plusieurs processus.
+
+    Retourne un dict {(chemin, plateforme): chemin_à_publier}. Chaque source est
+    sondée et hachée une seule fois pour toutes ses plateformes, et pas hachée du tout
+    si elle respecte déjà tous les profils. Les threads ffmpeg sont répartis entre les
+    workers pour ne pas surcharger les cœurs. expires (time.monotonic) borne le lot
+    entier : un job mis en file derrière les autres ne dispose que du temps restant à
+    son démarrage. Le cache est ensuite ramené sous CACHE_MAX_MB.
+    """
+    jobs = list(dict.fromkeys(jobs))
+    if not jobs:
+        return {}
+    platforms = {}
+    for src, platform in jobs:
+        platforms.setdefault(src, []).append(platform)
+    cpus = os.cpu_count() or 1
+    workers = workers or min(len(jobs), cpus)
+    threads = max(1, cpus // workers)
+
+    results = {}
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        inspections = {src: pool.submit(_inspect, src, p) for src, p in platforms.items()}
+        futures = {}
+        for src, future in inspections.items():
+            try:
+                info, needed, digest = future.result()
+            except Exception as exc:
+                raise RuntimeError(f"Transcodage {os.path.basename(src)} : {exc}") from exc
+            for platform in platforms[src]:
+                if platform in needed:
+                    futures[(src, platform)] = pool.submit(
+                        transcode, src, platform, threads, expires, digest, info,
+                    )
+                else:
+                    results[(src, platform)] = src
+        for (src, platform), future in futures.items():
+            try:
+                results[(src, platform)] = future.result()
+            except Exception as exc:
+                raise RuntimeError(
+                    f"Transcodage {os.path.basename(src)} ({platform}) : {exc}"
+                ) from exc
+    except BaseException:
+        # Un job en échec : les jobs encore en file sont annulés, sans attendre qu'ils
+        # tournent jusqu'au bout avant de signaler l'erreur.
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+    prune_cache(keep=set(results.values()))
+    return results
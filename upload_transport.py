@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""Transport d'upload bas niveau : corps de requête envoyé par sendfile (zéro copie).
+
+requests recopie chaque bloc du fichier dans l'espace utilisateur Python ; ici le
+fichier part directement du noyau vers le socket (socket.sendfile). En HTTPS, le
+chiffrement se fait côté utilisateur : on se rabat sur de grands tampons memoryview
+réutilisés, sans allocation par bloc. Si un proxy est configuré, on délègue à requests.
+"""
+
+import http.client
+import json
+import os
+import socket
+import ssl
+import time
+import urllib.parse
+import urllib.request
+import uuid
+
+import requests
+import requests.certs
+from requests.structures import CaseInsensitiveDict
+
+from deadline import DeadlineExceeded
+
+# Tampon de repli TLS : assez grand pour amortir le coût par appel de send().
+TLS_BUFFER_SIZE = 4 * 1024 * 1024
+# sendfile par tranches : l'échéance globale est vérifiée entre deux tranches.
+SENDFILE_CHUNK = 16 * 1024 * 1024
+USER_AGENT = "publipostage"
+
+
+class Response:
+    """Réponse HTTP minimale, compatible avec l'usage fait des réponses requests."""
+
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        # Insensible à la casse, comme les en-têtes d'une réponse requests.
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+
+def _use_requests(url):
+    """Vrai si un proxy s'applique à l'URL : seul requests sait le traverser."""
+    parts = urllib.parse.urlsplit(url)
+    proxies = urllib.request.getproxies()
+    # "all" (ALL_PROXY) vaut pour tous les schémas, comme dans requests.
+    if parts.scheme not in proxies and "all" not in proxies:
+        return False
+    return not urllib.request.proxy_bypass(parts.hostname)
+
+
+def upload_path(url):
+    """Chemin d'envoi effectivement utilisé pour l'URL : "requests", "sendfile" ou "tampon TLS"."""
+    if _use_requests(url):
+        return "requests"
+    return "tampon TLS" if urllib.parse.urlsplit(url).scheme == "https" else "sendfile"
+
+
+def _connect(parts, timeout):
+    """Ouvre le socket (TLS si https) vers l'hôte de l'URL."""
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    sock = socket.create_connection((parts.hostname, port), timeout=timeout)
+    if parts.scheme == "https":
+        # Mêmes autorités que requests (certifi, ou REQUESTS_CA_BUNDLE) : le magasin par
+        # défaut d'OpenSSL est vide sur certains Python (python.org, uv) sous macOS.
+        context = ssl.create_default_context(
+            cafile=os.environ.get("REQUESTS_CA_BUNDLE") or requests.certs.where(),
+        )
+        sock = context.wrap_socket(sock, server_hostname=parts.hostname)
+    return sock
+
+
+def _check_expires(expires):
+    """Lève DeadlineExceeded si l'échéance globale (horloge monotone) est passée."""
+    if expires is not None and time.monotonic() > expires:
+        raise DeadlineExceeded("délai dépassé pendant l'upload")
+
+
+def _send_file(sock, f, offset, count, expires=None):
+    """Envoie count octets du fichier : sendfile en clair, tampon memoryview en TLS.
+
+    expires (horloge monotone) borne la durée totale de l'envoi, là où le timeout du
+    socket ne borne que chaque opération.
+    """
+    if not isinstance(sock, ssl.SSLSocket):
+        end = offset + count
+        while offset < end:
+            _check_expires(expires)
+            sent = sock.sendfile(f, offset, min(SENDFILE_CHUNK, end - offset))
+            if not sent:
+                raise OSError("fichier tronqué pendant l'upload")
+            offset += sent
+        return
+
+    buf = memoryview(bytearray(min(TLS_BUFFER_SIZE, max(count, 1))))
+    f.seek(offset)
+    while count > 0:
+        _check_expires(expires)
+        n = f.readinto(buf[:min(len(buf), count)])
+        if not n:
+            raise OSError("fichier tronqué pendant l'upload")
+        sock.sendall(buf[:n])
+        count -= n
+
+
+def _request(method, url, headers, preamble, file_path, epilogue, timeout, expires=None):
+    """Envoie preamble + contenu du fichier + epilogue comme corps, lit la réponse."""
+    _check_expires(expires)
+    parts = urllib.parse.urlsplit(url)
+    target = parts.path or "/"
+    if parts.query:
+        target += f"?{parts.query}"
+    size = os.path.getsize(file_path)
+
+    head = {
+        "Host": parts.netloc,
+        "User-Agent": USER_AGENT,
+        "Accept": "*/*",
+        "Connection": "close",
+        **headers,
+        "Content-Length": str(len(preamble) + size + len(epilogue)),
+    }
+    request_head = f"{method} {target} HTTP/1.1\r\n"
+    request_head += "".join(f"{k}: {v}\r\n" for k, v in head.items()) + "\r\n"
+
+    try:
+        with _connect(parts, timeout) as sock, open(file_path, "rb") as f:
+            try:
+                sock.sendall(request_head.encode("latin-1") + preamble)
+                _send_file(sock, f, 0, size, expires)
+                if epilogue:
+                    sock.sendall(epilogue)
+            except (BrokenPipeError, ConnectionResetError) as exc:
+                # Le serveur a refusé la requête avant la fin du corps (413, URL expirée…)
+                # puis fermé la connexion : comme requests, on lit sa réponse si elle est là.
+                try:
+                    resp = http.client.HTTPResponse(sock, method=method)
+                    resp.begin()
+                    content = resp.read()
+                except (OSError, http.client.HTTPException):
+                    raise exc from None
+                return Response(url, resp.status, resp.getheaders(), content)
+            resp = http.client.HTTPResponse(sock, method=method)
+            resp.begin()
+            content = resp.read()
+    except TimeoutError:
+        # Timeout du socket réduit au temps restant : s'il est écoulé, c'est une annulation.
+        _check_expires(expires)
+        raise
+    return Response(url, resp.status, resp.getheaders(), content)
+
+
+def put_file(url, file_path, headers=None, timeout=600, expires=None):
+    """PUT du fichier brut comme corps de requête."""
+    if _use_requests(url):
+        with open(file_path, "rb") as f:
+            return requests.put(url, headers=headers, data=f, timeout=timeout)
+    return _request("PUT", url, headers or {}, b"", file_path, b"", timeout, expires)
+
+
+def _quote_param(value):
+    """Valeur entre guillemets pour Content-Disposition (name, filename).
+
+    Guillemets et antislashs sont échappés ; un retour à la ligne couperait l'en-tête
+    de la partie, il est refusé.
+    """
+    if any(c in value for c in "\r\n\0"):
+        raise ValueError(f"caractère de contrôle interdit dans {value!r}")
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def post_multipart(url, file_field, file_path, fields=None, filename=None, timeout=600,
+                   expires=None):
+    """POST multipart/form-data : champs texte puis le fichier, envoyé par sendfile."""
+    filename = filename or os.path.basename(file_path)
+    if _use_requests(url):
+        with open(file_path, "rb") as f:
+            return requests.post(
+                url, data=fields, files={file_field: (filename, f)}, timeout=timeout,
+            )
+
+    boundary = uuid.uuid4().hex
+    preamble = b"".join(
+        f"--{boundary}\r\nContent-Disposition: form-data; name={_quote_param(name)}\r\n\r\n"
+        f"{value}\r\n".encode()
+        for name, value in (fields or {}).items()
+    )
+    preamble += (
+        f"--{boundary}\r\n"
+        f"Content-Disposition: form-data; name={_quote_param(file_field)}; "
+        f"filename={_quote_param(filename)}\r\n"
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode()
+    epilogue = f"\r\n--{boundary}--\r\n".encode()
+    headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    return _request("POST", url, headers, preamble, file_path, epilogue, timeout, expires)
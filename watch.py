@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""Surveillance de media_dir : détecte les paires .mp4/.txt complètes dès leur arrivée.
+
+Linux : inotify (via ctypes) ; macOS/BSD : kqueue ; sinon scrutation périodique.
+Sur un volume réseau (NFS, SMB...), inotify ne voit pas les fichiers écrits par
+d'autres machines : la scrutation périodique y est utilisée d'office.
+Les notifications ne disent pas qu'un fichier est fini d'écrire : une paire n'est
+déclarée prête que lorsque taille et date des deux fichiers n'ont plus bougé
+pendant WATCH_STABLE_SECONDS.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import re
+import select
+import struct
+import sys
+import time
+
+WATCH_STABLE_SECONDS = 3
+WATCH_POLL_INTERVAL = 10
+# Intervalle de vérification de stabilité quand des paires sont en cours d'écriture.
+WATCH_SETTLE_INTERVAL = 1
+# Types de systèmes de fichiers partagés : les notifications n'y voient que les écritures locales.
+NETWORK_FS_TYPES = {
+    "nfs", "nfs4", "cifs", "smbfs", "smb3", "afs", "9p", "ceph", "glusterfs",
+    "fuse.sshfs", "fuse.glusterfs", "fuse.cephfs", "lustre", "gpfs", "beegfs",
+}
+
+_IN_MODIFY = 0x002
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = 0o2000000
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class _InotifySource:
+    """Événements inotify sur le répertoire : retourne les noms de fichiers touchés."""
+
+    def __init__(self, media_dir):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify indisponible")
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(media_dir), mask) < 0:
+            raise OSError(ctypes.get_errno(), "inotify_add_watch")
+
+    def wait(self, timeout):
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return set()
+        data = os.read(self.fd, 64 * 1024)
+        names, pos = set(), 0
+        while pos < len(data):
+            _, _, _, length = _INOTIFY_EVENT.unpack_from(data, pos)
+            pos += _INOTIFY_EVENT.size
+            names.add(os.fsdecode(data[pos:pos + length].rstrip(b"\0")))
+            pos += length
+        return names
+
+
+class _KqueueSource:
+    """kqueue (macOS/BSD) : signale un changement dans le répertoire, sans préciser lequel."""
+
+    def __init__(self, media_dir):
+        self.media_dir = media_dir
+        self.kq = select.kqueue()
+        self.fd = os.open(media_dir, getattr(os, "O_EVTONLY", os.O_RDONLY))
+        self.event = select.kevent(
+            self.fd, filter=select.KQ_FILTER_VNODE,
+            flags=select.KQ_EV_ADD | select.KQ_EV_CLEAR,
+            fflags=select.KQ_NOTE_WRITE | select.KQ_NOTE_EXTEND,
+        )
+
+    def wait(self, timeout):
+        if not self.kq.control([self.event], 1, timeout):
+            return set()
+        return set(os.listdir(self.media_dir))
+
+
+class _PollingSource:
+    """Repli : relit le répertoire à intervalle fixe et retourne les fichiers modifiés."""
+
+    def __init__(self, media_dir):
+        self.media_dir = media_dir
+        self.seen = {}
+
+    def wait(self, timeout):
+        time.sleep(WATCH_POLL_INTERVAL if timeout is None else min(timeout, WATCH_POLL_INTERVAL))
+        current = {}
+        with os.scandir(self.media_dir) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    st = entry.stat()
+                    current[entry.name] = (st.st_size, st.st_mtime)
+        changed = {name for name, sig in current.items() if self.seen.get(name) != sig}
+        self.seen = current
+        return changed
+
+
+def _mount_fstype(path):
+    """Type du système de fichiers contenant path (Linux, via /proc/self/mounts), ou None."""
+    try:
+        with open("/proc/self/mounts") as f:
+            mounts = [line.split()[1:3] for line in f]
+    except OSError:
+        return None
+    path = os.path.realpath(path)
+    best, fstype = "", None
+    for mount_point, kind in mounts:
+        # Les espaces et caractères spéciaux sont échappés en octal (\040).
+        mount_point = re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), mount_point)
+        inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+        if inside and len(mount_point) >= len(best):
+            best, fstype = mount_point, kind
+    return fstype
+
+
+def _open_source(media_dir, poll=False):
+    """Choisit le mécanisme de notification disponible, du plus efficace au plus simple."""
+    fstype = _mount_fstype(media_dir)
+    if poll or fstype in NETWORK_FS_TYPES:
+        if fstype in NETWORK_FS_TYPES:
+            print(f"  Volume partagé ({fstype}) : scrutation périodique")
+        return _PollingSource(media_dir)
+    if sys.platform.startswith("linux"):
+        try:
+            return _InotifySource(media_dir)
+        except OSError as exc:
+            print(f"  inotify indisponible ({exc}), scrutation périodique", file=sys.stderr)
+    elif hasattr(select, "kqueue"):
+        return _KqueueSource(media_dir)
+    return _PollingSource(media_dir)
+
+
+def pair_signature(media_dir, stem):
+    """(taille, mtime) de la vidéo et du texte, ou None si la paire est incomplète."""
+    sig = []
+    for ext in (".mp4", ".txt"):
+        try:
+            st = os.stat(os.path.join(media_dir, stem + ext))
+        except FileNotFoundError:
+            return None
+        sig.append((st.st_size, st.st_mtime_ns))
+    return tuple(sig)
+
+
+def watch(media_dir, on_pair, stable_seconds=WATCH_STABLE_SECONDS, poll=False):
+    """Appelle on_pair(nom) pour chaque paire complète et stable apparue dans media_dir.
+
+    Les paires déjà présentes au démarrage sont traitées aussi. on_pair retourne None,
+    ou un délai (s) au bout duquel la paire, si elle est toujours là, est proposée à
+    nouveau (paire réservée par un autre worker, ou reportée). Sinon une paire restée
+    en place n'est retentée que si l'un de ses fichiers change. poll force la
+    scrutation périodique.
+    """
+    source = _open_source(media_dir, poll)
+    # nom -> (signature observée, instant depuis lequel elle n'a pas changé)
+    candidates = {}
+    handled = {}
+    # nom -> instant (horloge monotone) de la prochaine tentative
+    retry_at = {}
+    changed = set(os.listdir(media_dir))
+
+    while True:
+        now = time.monotonic()
+        for name in changed:
+            stem, ext = os.path.splitext(name)
+            if ext in (".mp4", ".txt"):
+                candidates.setdefault(stem, (None, now))
+        for stem, due in list(retry_at.items()):
+            if due <= now:
+                del retry_at[stem]
+                handled.pop(stem, None)
+                candidates.setdefault(stem, (None, now))
+
+        for stem, (last_sig, since) in list(candidates.items()):
+            sig = pair_signature(media_dir, stem)
+            if sig is None:
+                # Paire déplacée (publiée) ou supprimée : plus rien à retenir.
+                del candidates[stem]
+                handled.pop(stem, None)
+            elif sig == handled.get(stem):
+                del candidates[stem]
+            elif sig != last_sig:
+                candidates[stem] = (sig, now)
+            elif now - since >= stable_seconds:
+                del candidates[stem]
+                retry_after = on_pair(stem)
+                sig = pair_signature(media_dir, stem)
+                if sig is None:
+                    handled.pop(stem, None)
+                    continue
+                handled[stem] = sig
+                if retry_after is not None:
+                    # Plancher : pas de boucle serrée sur une paire toujours indisponible.
+                    retry_at[stem] = time.monotonic() + max(retry_after, WATCH_POLL_INTERVAL)
+
+        timeout = WATCH_SETTLE_INTERVAL if candidates else None
+        if retry_at:
+            until_retry = max(0, min(retry_at.values()) - time.monotonic())
+            timeout = until_retry if timeout is None else min(timeout, until_retry)
+        changed = source.wait(timeout)
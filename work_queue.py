@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""File de travail partagée : baux (leases) sur les paires de media_dir.
+
+Plusieurs processus, sur une ou plusieurs machines, peuvent vider le même media_dir :
+chaque paire est réservée par un bail dans LEASE_DIRNAME (sur le volume partagé),
+renouvelé par un heartbeat. Un bail expiré (worker planté) est repris
+automatiquement ; les plateformes déjà publiées y sont notées pour ne jamais
+publier deux fois.
+
+Chaque reprise crée un nouveau fichier de génération ({stem}.gen{N}, création O_EXCL) :
+un worker n'écrit jamais que le fichier de sa propre génération. Un ancien
+propriétaire (mis en pause, réseau coupé) ne peut donc pas écraser le bail de son
+successeur ; il constate la perte dès qu'une génération plus récente existe.
+
+Seules des opérations atomiques sur le système de fichiers sont utilisées
+(création O_EXCL, os.replace) : pas de SQLite, dont le verrouillage n'est pas fiable
+sur un volume réseau.
+"""
+
+import json
+import os
+import re
+import socket
+import sys
+import threading
+import time
+import uuid
+
+from watch import pair_signature
+
+LEASE_DIRNAME = ".leases"
+# Durée d'un bail : large devant le décalage d'horloge possible entre machines.
+LEASE_TTL = 300
+HEARTBEAT_INTERVAL = LEASE_TTL / 3
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaseLost(RuntimeError):
+    """Le bail a été repris par un autre worker : la paire ne doit plus être publiée ici."""
+
+
+def _failed_on_same_files(state, media_dir, stem):
+    """Vrai si le bail note un échec sur ces mêmes fichiers (failed_sig inchangée).
+
+    failed_sig revient du JSON sous forme de listes : convertie ici pour être comparée
+    à la signature courante.
+    """
+    failed_sig = state.get("failed_sig")
+    if not failed_sig:
+        return False
+    return tuple(map(tuple, failed_sig)) == pair_signature(media_dir, stem)
+
+
+def _create_exclusive(path, data):
+    """Crée le fichier s'il n'existe pas (atomique). Retourne False s'il existe déjà."""
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f)
+    return True
+
+
+def _read_lease(path):
+    """Contenu du bail, ou None s'il est absent ou en cours d'écriture."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_lease(path, state):
+    """Remplace le bail de façon atomique (les lecteurs voient l'ancien ou le nouveau)."""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _lease_path(media_dir, stem, gen):
+    return os.path.join(media_dir, LEASE_DIRNAME, f"{stem}.gen{gen}")
+
+
+def _generations(media_dir, stem):
+    """Générations de bail existantes pour la paire, par ordre croissant."""
+    pattern = re.compile(re.escape(stem) + r"\.gen(\d+)")
+    try:
+        names = os.listdir(os.path.join(media_dir, LEASE_DIRNAME))
+    except FileNotFoundError:
+        return []
+    return sorted(int(m.group(1)) for name in names if (m := pattern.fullmatch(name)))
+
+
+def _done_since(media_dir, stem, gens):
+    """Plateformes publiées d'après les baux des générations données."""
+    done = set()
+    for gen in gens:
+        state = _read_lease(_lease_path(media_dir, stem, gen))
+        if state:
+            done.update(state.get("done", []))
+    return done
+
+
+class Lease:
+    """Bail détenu sur une paire : heartbeat en tâche de fond, suivi des plateformes publiées."""
+
+    def __init__(self, media_dir, stem, state):
+        self.media_dir = media_dir
+        self.stem = stem
+        self.path = _lease_path(media_dir, stem, state["gen"])
+        self.state = state
+        self.lost = False
+        # Délai (s) avant nouvelle tentative si des plateformes ont été reportées (quota).
+        self.retry_after = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        self._thread.start()
+
+    @property
+    def done(self):
+        """Plateformes déjà publiées pour cette paire (y compris par un worker précédent)."""
+        return set(self.state["done"])
+
+    def _write(self):
+        _write_lease(self.path, self.state)
+
+    def _superseded(self, gens):
+        """Vrai si le bail a été repris : génération plus récente, ou la nôtre supprimée
+        par un successeur qui a déjà terminé la paire."""
+        return self.state["gen"] not in gens or gens[-1] > self.state["gen"]
+
+    def _renew(self):
+        with self._lock:
+            if self.lost:
+                return
+            gens = _generations(self.media_dir, self.stem)
+            if self._superseded(gens):
+                print(f"  Bail perdu pour {self.stem} (repris par un autre worker)", file=sys.stderr)
+                self.lost = True
+                return
+            # Un worker précédent a pu noter une publication après notre reprise.
+            older = [gen for gen in gens if gen < self.state["gen"]]
+            self.state["done"] = sorted(self.done | _done_since(self.media_dir, self.stem, older))
+            self.state["expires"] = time.time() + LEASE_TTL
+            self._write()
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            self._renew()
+
+    def check(self):
+        """Renouvelle le bail et lève LeaseLost s'il a été repris : à appeler avant
+        toute publication, pour qu'un worker dépossédé ne publie jamais en double."""
+        self._renew()
+        if self.lost:
+            raise LeaseLost(f"bail perdu pour {self.stem} (repris par un autre worker)")
+
+    def mark_done(self, platform):
+        """Note une plateforme publiée : un worker qui reprendrait le bail la sautera."""
+        with self._lock:
+            self.state["done"] = sorted(self.done | {platform})
+            self._write()
+
+    def defer(self, wait):
+        """Note une plateforme reportée : le bail sera gardé jusqu'à ce qu'elle soit admissible."""
+        self.retry_after = wait if self.retry_after is None else min(self.retry_after, wait)
+
+    def release(self, failed=False):
+        """Libère le bail. En échec, la paire n'est retentée que si ses fichiers changent.
+
+        Si des plateformes ont été reportées (defer), le bail est conservé et expire au
+        moment où leur quota se libère : la paire est alors reprise par le premier worker
+        disponible, sans republier les plateformes déjà faites.
+        """
+        self._stop.set()
+        self._thread.join()
+        with self._lock:
+            gens = _generations(self.media_dir, self.stem)
+            if self.lost or self._superseded(gens):
+                self.lost = True
+                return
+            if failed or self.retry_after is not None:
+                older = [gen for gen in gens if gen < self.state["gen"]]
+                self.state["done"] = sorted(self.done | _done_since(self.media_dir, self.stem, older))
+                if failed:
+                    self.state.update(expires=0, failed_sig=pair_signature(self.media_dir, self.stem))
+                else:
+                    self.state.update(expires=time.time() + self.retry_after, deferred=True)
+                self._write()
+                gens = older
+            for gen in gens:
+                try:
+                    os.remove(_lease_path(self.media_dir, self.stem, gen))
+                except FileNotFoundError:
+                    pass
+
+
+def claim(media_dir, stem):
+    """Tente de réserver la paire stem. Retourne un Lease, ou None si elle est prise.
+
+    Un bail expiré est repris par le seul worker qui parvient à créer le fichier de la
+    génération suivante ; celui de la génération courante n'est jamais supprimé pendant
+    la reprise, donc aucun autre worker ne peut croire la paire libre entre-temps.
+    """
+    os.makedirs(os.path.join(media_dir, LEASE_DIRNAME), exist_ok=True)
+    now = time.time()
+    state = {"worker": WORKER_ID, "gen": 1, "expires": now + LEASE_TTL, "done": []}
+
+    gens = _generations(media_dir, stem)
+    if gens:
+        path = _lease_path(media_dir, stem, gens[-1])
+        current = _read_lease(path)
+        if current is None:
+            # Bail en cours d'écriture, ou laissé vide par un worker planté juste après sa création.
+            try:
+                if now - os.path.getmtime(path) < LEASE_TTL:
+                    return None
+            except FileNotFoundError:
+                return None
+            current = {"expires": 0}
+        if current["expires"] > now:
+            return None
+        if _failed_on_same_files(current, media_dir, stem):
+            # Échec déjà constaté sur ces mêmes fichiers : on ne boucle pas dessus.
+            return None
+        state.update(gen=gens[-1] + 1, done=sorted(_done_since(media_dir, stem, gens)))
+
+    if not _create_exclusive(_lease_path(media_dir, stem, state["gen"]), state):
+        return None
+    if gens and current.get("worker") and not current.get("failed_sig") and not current.get("deferred"):
+        print(f"  Reprise du bail expiré de {current['worker']} pour {stem}")
+
+    lease = Lease(media_dir, stem, state)
+    # La paire a pu être publiée et déplacée entre le listing et la réservation.
+    if pair_signature(media_dir, stem) is None:
+        lease.release()
+        return None
+    return lease
+
+
+def retry_delay(media_dir, stem):
+    """Délai (s) avant que la paire, toujours présente, puisse être réservée à nouveau.
+
+    Retourne None s'il n'y a rien à attendre : pas de bail (paire libre ou terminée),
+    ou échec déjà constaté sur ces mêmes fichiers.
+    """
+    gens = _generations(media_dir, stem)
+    if not gens:
+        return None
+    current = _read_lease(_lease_path(media_dir, stem, gens[-1]))
+    if current is None:
+        return LEASE_TTL
+    if _failed_on_same_files(current, media_dir, stem):
+        return None
+    return max(0, current["expires"] - time.time())